@@ -4,8 +4,6 @@ Email: danaukes<at>asu.edu.
 Please see LICENSE for full license.
 """
 
-import numpy
-
 
 class Node(object):
 
@@ -21,16 +19,21 @@ class Node(object):
         self.network = network
 
     def ancestors(self):
-        return self.network.itemparents(self.network.B, self)
+        return self.network.ancestors(self)
 
     def decendents(self):
-        return self.network.itemchildren(self.network.B, self)
-        
+        return self.network.decendents(self)
+
     def parents(self):
-        return self.network.itemparents(self.network.A, self)
+        return self.network.parents(self)
 
     def children(self):
-        return self.network.itemchildren(self.network.A, self)
+        return self.network.children(self)
+
+
+class CycleError(Exception):
+    def __init__(self):
+        Exception.__init__(self, 'Connections form a cycle')
 
 
 class AcyclicDirectedGraph(object):
@@ -40,7 +43,7 @@ class AcyclicDirectedGraph(object):
     def __init__(self, nodes=None, connections=None):
         self.nodes = []
         self.connections = []
-        self.A = numpy.array([[]])
+        self.process()
         if nodes is not None:
             self.addnodes(nodes)
             if connections is not None:
@@ -48,27 +51,26 @@ class AcyclicDirectedGraph(object):
 
     def sequence_complete_valid(self, sequence):
         '''checks whether a given sequence's nodes have all their parents in the subsequence as well'''
-        for ii, node in enumerate(sequence):
-            above = set(sequence[:ii])
-            below = set(sequence[ii + 1:])
-
-            ancestors = set(node.ancestors())
-            decendents = set(node.decendents())
-
-            if len(ancestors.difference(above)) > 0:
-                return False
-            if len(decendents.difference(below)) > 0:
-                return False
-            if len(above.intersection(decendents)) > 0:
-                return False
-            if len(below.intersection(ancestors)) > 0:
-                return False
+        positions = dict([(node, ii) for ii, node in enumerate(sequence)])
+        for parent, child in self.connections:
+            if parent in positions or child in positions:
+                if parent not in positions or child not in positions:
+                    return False
+                if positions[parent] >= positions[child]:
+                    return False
         return True
 
     def process(self):
+        '''rebuild the adjacency lists and topological order, discarding cached reachability'''
         self.forwardindex, self.reverseindex = self.build_indeces(self.nodes)
-        self.A, self.B = self.buildAB(
-            self.nodes, self.connections, self.forwardindex)
+        self.child_lists = dict([(node, []) for node in self.nodes])
+        self.parent_lists = dict([(node, []) for node in self.nodes])
+        for parent, child in self.connections:
+            self.child_lists[parent].append(child)
+            self.parent_lists[child].append(parent)
+        self.order = self.topological_order()
+        self._ancestors = {}
+        self._decendents = {}
 
     def addnodes(self, nodes):
         '''add a list of nodes to the network'''
@@ -81,12 +83,10 @@ class AcyclicDirectedGraph(object):
 
     def addconnections(self, connections):
         '''add a list of connections to the network and recalculate internal stuff'''
+        nodes = set(self.nodes)
         for parent, child in connections:
-            if parent in self.nodes and child in self.nodes:
-                if parent in child.decendents():
-                    raise Exception
-                else:
-                    self.connections.append((parent, child))
+            if parent in nodes and child in nodes:
+                self.connections.append((parent, child))
         self.connections = list(set(self.connections))
         self.process()
 
@@ -96,31 +96,56 @@ class AcyclicDirectedGraph(object):
         reverseindex = dict([(ii, node) for ii, node in enumerate(nodes)])
         return forwardindex, reverseindex
 
+    def topological_order(self):
+        '''order the nodes so every parent comes before its children.  raises CycleError if that is impossible'''
+        remaining = dict([(node, len(parents)) for node, parents in self.parent_lists.items()])
+        ready = [node for node in self.nodes if remaining[node] == 0]
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for child in self.child_lists[node]:
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    ready.append(child)
+        if len(order) != len(self.nodes):
+            raise CycleError()
+        return order
+
+    def parents(self, child):
+        return self.sort_nodes(set(self.parent_lists[child]))
+
+    def children(self, parent):
+        return self.sort_nodes(set(self.child_lists[parent]))
+
+    def ancestors(self, node):
+        try:
+            return self._ancestors[node][:]
+        except KeyError:
+            self._ancestors[node] = self.sort_nodes(self.reachable(node, self.parent_lists))
+            return self._ancestors[node][:]
+
+    def decendents(self, node):
+        try:
+            return self._decendents[node][:]
+        except KeyError:
+            self._decendents[node] = self.sort_nodes(self.reachable(node, self.child_lists))
+            return self._decendents[node][:]
+
     @staticmethod
-    def buildAB(nodes, connections, forwardindex):
-        '''build internal representation of directed connections'''
-        m = len(nodes)
-        A = numpy.zeros((m, m), dtype=bool)
-        for connection in connections:
-            A[forwardindex[connection[0]], forwardindex[connection[1]]] = 1
-        B = A.copy()
-        lastB = numpy.zeros(A.shape)
-        while not (B == lastB).all():
-            lastB = B
-            B = B.dot(A) + B
-        return A, B
-
-    def itemparents(self, C, child):
-        '''return the parents of a particular node.  The input connection matrix C determines what type of relationship'''
-        return self.itemchildren(C.T, child)
-
-    def itemchildren(self, C, parent):
-        '''return the children of a particular node.  The input connection matrix C determines what type of relationship'''
-#        array = numpy.array(C)
-        ii = self.forwardindex[parent]
-        itemparents = C[ii, :].nonzero()[0].tolist()
-        itemparents = [self.reverseindex[item] for item in itemparents]
-        return itemparents
+    def reachable(node, adjacency):
+        '''every node reachable from node through the adjacency lists, not including node itself'''
+        found = set()
+        stack = list(adjacency[node])
+        while stack:
+            item = stack.pop()
+            if item not in found:
+                found.add(item)
+                stack.extend(adjacency[item])
+        return found
+
+    def sort_nodes(self, nodes):
+        return sorted(nodes, key=lambda node: self.forwardindex[node])
 
 if __name__ == '__main__':
     pass
@@ -8,10 +8,14 @@ Please see LICENSE for full license.
 
 import sys
 
-from shapely import speedups
+#shapely 2 always uses its compiled routines and no longer needs speedups
+try:
+    from shapely import speedups
+except ImportError:
+    speedups = None
 
 # necessary for homebrewed libgeos which does not work with speedups for some reason.
-if sys.platform != 'darwin':
+if sys.platform != 'darwin' and speedups is not None:
     if speedups.available:
         speedups.enable()
 
@@ -5,6 +5,8 @@ Email: danaukes<at>asu.edu.
 Please see LICENSE for full license.
 """
 from . import body_detection
+from . import buffer_cache
+from . import content_hash
 from . import csg_shapely
 from . import design_documentation
 from . import getjoints
@@ -14,8 +16,11 @@ from . import minimal_enclosing_circle
 from . import modify_device
 from . import morphology
 from . import painterpath
+from . import parallel_regen
 from . import points
 from . import python_syntax_formatter
+from . import regen_disk_cache
+from . import regen_profiler
 from . import removability
 from . import spline_functions
 from . import tetrahedron
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+"""
+import collections
+import threading
+import popupcad
+
+_cache = collections.OrderedDict()
+_lock = threading.Lock()
+
+def key(layer, value, kwargs):
+    return (layer.fingerprint(), popupcad.algorithms.csg_shapely.grid_size(), value, tuple(sorted(kwargs.items())))
+
+def buffer(layer, value, **kwargs):
+    '''
+    layer buffered by value, reusing the result of an earlier buffer of identical geometry with the same arguments.
+    the cache holds at most popupcad.buffer_cache_size results and drops the least recently used first.
+    '''
+    if not popupcad.buffer_cache:
+        return layer.valueoperation('buffer', value, **kwargs)
+    item_key = key(layer, value, kwargs)
+    with _lock:
+        try:
+            result = _cache.pop(item_key)
+            _cache[item_key] = result
+            return result.shallow_copy()
+        except KeyError:
+            pass
+    result = layer.valueoperation('buffer', value, **kwargs)
+    with _lock:
+        _cache[item_key] = result
+        while len(_cache) > popupcad.buffer_cache_size:
+            _cache.popitem(last=False)
+    return result.shallow_copy()
+
+def clear():
+    with _lock:
+        _cache.clear()
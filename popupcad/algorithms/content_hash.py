@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+"""
+import hashlib
+import yaml
+
+def hash_strings(*strings):
+    '''combine a sequence of strings into one stable hex digest'''
+    h = hashlib.sha1()
+    for item in strings:
+        h.update(str(item).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+def hash_yaml(item):
+    '''hash an object by its yaml representation, which is what gets saved to disk'''
+    return hash_strings(yaml.dump(item))
+
+def hash_file_object(item):
+    '''hash a popupcad file object(sketch, design, layerdef) by the content of an identical copy'''
+    return hash_yaml(item.copy())
+
+def hash_layer(layer):
+    '''hash the geometry of a single Layer'''
+    return hash_strings(*[geom.wkb_hex for geom in layer.geoms])
+
+def hash_laminate(laminate):
+    '''hash the geometry of a laminate, layer by layer in layer definition order'''
+    layer_keys = []
+    for layer in laminate.layerdef.layers:
+        layer_keys.append(laminate.layer_sequence[layer].fingerprint())
+    return hash_strings(*layer_keys)
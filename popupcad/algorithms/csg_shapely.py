@@ -5,9 +5,28 @@ Email: danaukes<at>asu.edu.
 Please see LICENSE for full license.
 """
 
+import shapely
 import shapely.geometry as sg
+import shapely.affinity as aff
+from shapely.errors import TopologicalError
+import numpy
 import popupcad
 
+try:
+    from shapely.errors import GEOSException
+except ImportError:
+    GEOSException = TopologicalError
+
+try:
+    from shapely.validation import make_valid
+except ImportError:
+    make_valid = None
+
+csg_errors = (TopologicalError, GEOSException, ValueError)
+
+#shapely 2 exposes geos operations as ufuncs over arrays of geometries
+vectorized = hasattr(shapely, 'get_parts')
+
 filter_list = [sg.Polygon,sg.LineString,sg.Point]
 
 class GeometryNotHandled(Exception):
@@ -32,75 +51,330 @@ def extract_individual_entities_recursive(list_in,entity_in):
     else:
         list_in.append(entity_in)
             
+def geometry_array(entities):
+    array = numpy.empty(len(entities), dtype=object)
+    for ii, item in enumerate(entities):
+        array[ii] = item
+    return array
+
+if vectorized:
+    collection_type_ids = [shapely.GeometryType.MULTIPOINT, shapely.GeometryType.MULTILINESTRING, shapely.GeometryType.MULTIPOLYGON, shapely.GeometryType.GEOMETRYCOLLECTION]
+    handled_type_ids = [shapely.GeometryType.POINT, shapely.GeometryType.LINESTRING, shapely.GeometryType.LINEARRING, shapely.GeometryType.POLYGON]
+
+def extract_individual_entities_array(entities):
+    '''split collections into their members, in order, until no collections remain'''
+    parts = geometry_array(entities)
+    while numpy.isin(shapely.get_type_id(parts), collection_type_ids).any():
+        parts = shapely.get_parts(parts)
+    return parts
+
 def extract_individual_entities(entities):
+    if vectorized:
+        return list(extract_individual_entities_array(entities))
     entities_out = []
     [extract_individual_entities_recursive(entities_out,item) for item in entities]
     return entities_out
 
 def condition_shapely_entities(*entities):
+    if vectorized:
+        parts = extract_individual_entities_array(entities)
+        keep = numpy.isin(shapely.get_type_id(parts), handled_type_ids) & ~shapely.is_empty(parts)
+        return list(parts[keep])
     entities = extract_individual_entities(entities)
     entities = [item for item in entities if any([isinstance(item,classitem) for classitem in filter_list])]
     entities = [item for item in entities if not item.is_empty]
 #    entities = [item for item in entities if not item.is_valid]
     return entities
 
-def get_shapely_vertices(entity,scaling = 1.0):
+def all_polygons(entities):
+    '''whether every entity is a polygon'''
+    if vectorized:
+        return bool((shapely.get_type_id(geometry_array(entities)) == shapely.GeometryType.POLYGON).all())
+    return all([isinstance(item, sg.Polygon) for item in entities])
+
+def envelope_overlaps(entities1, entities2):
+    '''for each entity in both lists, whether its envelope overlaps the envelope of any entity in the other list'''
+    overlaps1 = numpy.zeros(len(entities1), dtype=bool)
+    overlaps2 = numpy.zeros(len(entities2), dtype=bool)
+    if len(entities1) == 0 or len(entities2) == 0:
+        return overlaps1, overlaps2
+    if vectorized:
+        tree = shapely.STRtree(geometry_array(entities2))
+        pairs = tree.query(geometry_array(entities1))
+        overlaps1[pairs[0]] = True
+        overlaps2[pairs[1]] = True
+        return overlaps1, overlaps2
+    bounds2 = numpy.array([item.bounds for item in entities2])
+    for ii, item in enumerate(entities1):
+        minx, miny, maxx, maxy = item.bounds
+        hits = (bounds2[:, 0] <= maxx) & (bounds2[:, 2] >= minx) & (bounds2[:, 1] <= maxy) & (bounds2[:, 3] >= miny)
+        if hits.any():
+            overlaps1[ii] = True
+            overlaps2 |= hits
+    return overlaps1, overlaps2
+
+def affine_transform_all(entities, matrix):
+    '''apply one shapely affine matrix [a, b, d, e, xoff, yoff] to every entity'''
+    if vectorized:
+        a, b, d, e, xoff, yoff = matrix
+        def affine_coords(coords):
+            #the same arithmetic as shapely.affinity, so results match it to the last bit
+            x, y = coords.T
+            return numpy.stack([a * x + b * y + xoff, d * x + e * y + yoff]).T
+        return list(shapely.transform(geometry_array(entities), affine_coords))
+    return [aff.affine_transform(item, matrix) for item in entities]
+
+def get_shapely_arrays(entity,scaling = 1.0):
     import shapely.geometry as sg
     import numpy
     
     if isinstance(entity,sg.Polygon):
-        exterior = (numpy.array([coord for coord in entity.exterior.coords])*scaling).tolist()
-        interiors = [(numpy.array([coord for coord in interior.coords])*scaling).tolist()
-                     for interior in entity.interiors]
+        exterior = numpy.array(entity.exterior.coords)*scaling
+        interiors = [numpy.array(interior.coords)*scaling for interior in entity.interiors]
 
     elif isinstance(entity,sg.LineString) or isinstance(entity,sg.Point):
-        exterior = (numpy.array([coord for coord in entity.coords])*scaling).tolist()
+        exterior = numpy.array(entity.coords)*scaling
         interiors = []
     else:
         raise GeometryNotHandled()
 
     return exterior, interiors
 
+def get_shapely_vertices(entity,scaling = 1.0):
+    exterior, interiors = get_shapely_arrays(entity,scaling)
+    return exterior.tolist(), [interior.tolist() for interior in interiors]
+
 def to_generic(entity):
     import shapely.geometry as sg
     from popupcad.filetypes.genericshapes import GenericPoly, GenericPolyline
     from popupcad.geometry.vertex import DrawnPoint
-    from popupcad.geometry.vertex import ShapeVertex
 
-    exterior_p, interiors_p = get_shapely_vertices(entity,1/popupcad.csg_processing_scaling)
-    exterior = [ShapeVertex(point) for point in exterior_p]
-    interiors= [[ShapeVertex(point) for point in interior] for interior in interiors_p]
+    exterior, interiors = get_shapely_arrays(entity,1/popupcad.csg_processing_scaling)
 
     if isinstance(entity, sg.Polygon):
         subclass = GenericPoly
     elif isinstance(entity, sg.LineString):
         subclass = GenericPolyline
     elif isinstance(entity, sg.Point):
-        s = DrawnPoint(exterior_p[0])
+        s = DrawnPoint(exterior.tolist()[0])
         return s
     else:
         raise GeometryNotHandled()
-    return subclass(exterior, interiors)
+    return subclass.gen_from_arrays(exterior, interiors)
         
+def split_coordinates(geoms, scaling):
+    '''the coordinates of each geometry in geoms as a separate array, read from shapely in one call'''
+    coordinates = shapely.get_coordinates(geoms) * scaling
+    counts = shapely.get_num_coordinates(geoms)
+    return coordinates, counts
+
+def to_generic_all(entities):
+    '''
+    to_generic for a list of entities.  under shapely 2 the coordinates of all polygons and of all lines are read at once,
+    redundant points are found for all loops together, and the shapes are built from slices of the result.
+    '''
+    if not vectorized:
+        return [to_generic(entity) for entity in entities]
+    from popupcad.filetypes.genericshapes import GenericPoly, GenericPolyline
+    from popupcad.filetypes.genericshapebase import allocate_ids
+
+    scaling = 1/popupcad.csg_processing_scaling
+    entities = geometry_array(entities)
+    type_ids = shapely.get_type_id(entities)
+    generics = [None] * len(entities)
+
+    polygon_index = numpy.nonzero(type_ids == shapely.GeometryType.POLYGON)[0]
+    rings, owners = shapely.get_rings(entities[polygon_index], return_index=True)
+    coordinates, lengths = split_coordinates(rings, scaling)
+    keep = GenericPoly.redundant_point_mask(coordinates, lengths)
+    ids = allocate_ids(len(coordinates))
+    loop_index = numpy.repeat(numpy.arange(len(lengths)), lengths)[keep]
+    offsets = numpy.cumsum(numpy.bincount(loop_index, minlength=len(lengths)))[:-1]
+    loops = numpy.split(coordinates[keep], offsets)
+    loop_ids = numpy.split(ids[keep], offsets)
+    ring_counts = numpy.bincount(owners, minlength=len(polygon_index))
+    first = 0
+    for ii, count in zip(polygon_index, ring_counts):
+        if count == 0:
+            generics[ii] = GenericPoly.gen_from_arrays([], [])
+        else:
+            generics[ii] = GenericPoly.gen_from_arrays(loops[first], loops[first + 1:first + count], exterior_ids=loop_ids[first], interior_ids=loop_ids[first + 1:first + count], remove_redundant=False)
+        first += count
+
+    line_index = numpy.nonzero(numpy.isin(type_ids, [shapely.GeometryType.LINESTRING, shapely.GeometryType.LINEARRING]))[0]
+    coordinates, lengths = split_coordinates(entities[line_index], scaling)
+    keep = GenericPolyline.redundant_point_mask(coordinates, lengths)
+    ids = allocate_ids(len(coordinates))
+    loop_index = numpy.repeat(numpy.arange(len(lengths)), lengths)[keep]
+    offsets = numpy.cumsum(numpy.bincount(loop_index, minlength=len(lengths)))[:-1]
+    for ii, loop, loop_ids in zip(line_index, numpy.split(coordinates[keep], offsets), numpy.split(ids[keep], offsets)):
+        generics[ii] = GenericPolyline.gen_from_arrays(loop, [], exterior_ids=loop_ids, interior_ids=[], remove_redundant=False)
+
+    for ii, generic in enumerate(generics):
+        if generic is None:
+            generics[ii] = to_generic(entities[ii])
+    return generics
+
+def to_shapely_all(generics):
+    '''
+    shapely geometry for a list of generic shapes.  under shapely 2, polygons and polylines without a cached conversion
+    are built together from their coordinate arrays, and the results are cached on the shapes.
+    '''
+    if not vectorized:
+        return [generic.to_shapely() for generic in generics]
+    from popupcad.filetypes.genericshapes import GenericPoly, GenericPolyline
+
+    scaling = popupcad.csg_processing_scaling
+    results = [None] * len(generics)
+    polygons = []
+    lines = []
+    for ii, generic in enumerate(generics):
+        if hasattr(generic, '_shapely_state'):
+            continue
+        if isinstance(generic, GenericPoly) and type(generic).gen_shapely is GenericPoly.gen_shapely:
+            loops = [generic.exterior_array(scaling)] + generic.interior_arrays(scaling)
+            if all([len(loop) >= 3 for loop in loops]):
+                polygons.append((ii, loops))
+        elif isinstance(generic, GenericPolyline) and type(generic).gen_shapely is GenericPolyline.gen_shapely:
+            loop = generic.exterior_array(scaling)
+            if len(loop) >= 2:
+                lines.append((ii, loop))
+
+    if len(polygons) > 0:
+        loops = [loop for ii, polygon_loops in polygons for loop in polygon_loops]
+        ring_index = numpy.repeat(numpy.arange(len(loops)), [len(loop) for loop in loops])
+        polygon_index = numpy.repeat(numpy.arange(len(polygons)), [len(polygon_loops) for ii, polygon_loops in polygons])
+        rings = shapely.linearrings(numpy.concatenate(loops), indices=ring_index)
+        for (ii, polygon_loops), geom in zip(polygons, shapely.polygons(rings, indices=polygon_index)):
+            results[ii] = geom
+    if len(lines) > 0:
+        line_index = numpy.repeat(numpy.arange(len(lines)), [len(loop) for ii, loop in lines])
+        for (ii, loop), geom in zip(lines, shapely.linestrings(numpy.concatenate([loop for ii, loop in lines]), indices=line_index)):
+            results[ii] = geom
+
+    for ii, generic in enumerate(generics):
+        if results[ii] is None:
+            results[ii] = generic.to_shapely()
+        else:
+            generic.cache_shapely(results[ii])
+    return results
+
+def grid_size():
+    '''
+    spacing of the precision grid overlay results are snapped to, in csg units, or None for floating precision.
+    fixed precision needs shapely 2; coordinates closer than popupcad.distinguishable_number_difference are merged.
+    '''
+    if vectorized and popupcad.csg_fixed_precision:
+        return popupcad.distinguishable_number_difference * popupcad.csg_processing_scaling
+    return None
+
+def overlay(geom1, functionname, geom2):
+    '''geom1.functionname(geom2), computed on the precision grid when one is in use'''
+    size = grid_size()
+    if size is None:
+        return getattr(geom1, functionname)(geom2)
+    return getattr(shapely, functionname)(geom1, geom2, grid_size=size)
+
+def snap_to_grid(entities):
+    '''
+    entities snapped to the precision grid as an overlay result would be, or unchanged under floating precision.
+    entities already on the grid are kept as they are. set_precision would otherwise rebuild them, and where their rings start
+    would depend on whether they still carry the grid they were made on, which pickling drops.
+    '''
+    size = grid_size()
+    if size is None:
+        return entities
+    geoms = geometry_array(entities)
+    off_grid = ~shapely.equals_exact(geoms, shapely.set_precision(geoms, size, mode='pointwise'), 0)
+    geoms[off_grid] = shapely.set_precision(geoms[off_grid], size)
+    return condition_shapely_entities(*geoms)
+
+def repair(geom):
+    '''return a valid version of geom, using make_valid where shapely provides it and a zero buffer otherwise'''
+    if geom.is_valid:
+        return geom
+    if make_valid is not None:
+        return make_valid(geom)
+    return geom.buffer(0)
+
+def union_pair(geom1, geom2):
+    '''union of two geometries, retried on repaired copies. returns None if both attempts fail'''
+    try:
+        return overlay(geom1, 'union', geom2)
+    except csg_errors:
+        pass
+    try:
+        return overlay(geom1.buffer(0), 'union', geom2.buffer(0))
+    except csg_errors:
+        return None
+
+def union_tree(items, indices):
+    '''
+    union items pairwise in a balanced binary tree.
+    returns the union and the indices of items that could not be merged, which are left out of the union.
+    when two subtrees fail to merge, only the items at fault are left out: items which fail to merge even with themselves,
+    or else those items of the smaller subtree which the larger one will not take one at a time.
+    '''
+    if len(items) == 1:
+        return items[0], []
+    middle = len(items) // 2
+    left, failed_left = union_tree(items[:middle], indices[:middle])
+    right, failed_right = union_tree(items[middle:], indices[middle:])
+    result = union_pair(left, right)
+    if result is not None:
+        return result, failed_left + failed_right
+    unmergeable = [ii for ii, item in enumerate(items) if union_pair(item, item) is None]
+    if 0 < len(unmergeable) < len(items):
+        keep = [ii for ii in range(len(items)) if ii not in unmergeable]
+        result, failed = union_tree([items[ii] for ii in keep], [indices[ii] for ii in keep])
+        return result, sorted(failed + [indices[ii] for ii in unmergeable])
+    if middle >= len(items) - middle:
+        result, failed = merge_into(left, items[middle:], indices[middle:], right, failed_right)
+        return result, failed_left + failed
+    else:
+        result, failed = merge_into(right, items[:middle], indices[:middle], left, failed_left)
+        return result, failed + failed_right
+
+def merge_into(result, items, indices, subtree, failed):
+    '''
+    union subtree, the union of items, into result. if that fails, items are split in halves which are merged one at a time,
+    down to single items, so that only the items which cannot be merged are left out.
+    '''
+    merged = union_pair(result, subtree)
+    if merged is not None:
+        return merged, failed
+    if len(items) == 1:
+        return result, indices[:]
+    middle = len(items) // 2
+    left, failed_left = union_tree(items[:middle], indices[:middle])
+    result, failed_left = merge_into(result, items[:middle], indices[:middle], left, failed_left)
+    right, failed_right = union_tree(items[middle:], indices[middle:])
+    result, failed_right = merge_into(result, items[middle:], indices[middle:], right, failed_right)
+    return result, failed_left + failed_right
+
 def unary_union_safe(listin):
-    '''try to perform a unary union.  if that fails, fall back to iterative union'''
-    import shapely
+    '''try to perform a unary union.  if that fails, repair the inputs and union them in a tree, leaving out any subtree that still fails'''
     import shapely.ops as so
 
     try:
+        size = grid_size()
+        if size is not None:
+            return shapely.unary_union(geometry_array(listin), grid_size=size)
         return so.unary_union(listin)
-    except (shapely.geos.TopologicalError, ValueError):
+    except csg_errors:
         print('Unary Union Failed.  Falling Back...')
-        workinglist = listin[:]
+
+    workinglist = []
+    indices = []
+    for ii, item in enumerate(listin):
         try:
-            result = workinglist.pop(0)
-            for item in workinglist:
-                try:
-                    newresult = result.union(item)
-                    result = newresult
-                except (shapely.geos.TopologicalError, ValueError):
-                    raise
-            return result
-        except IndexError:
-            #            return sg.GeometryCollection()
-            raise
+            workinglist.append(repair(item))
+            indices.append(ii)
+        except csg_errors:
+            print('Could not repair geometry {0:d}, leaving it out'.format(ii))
+    if len(workinglist) == 0:
+        return sg.GeometryCollection()
+    result, failed = union_tree(workinglist, indices)
+    for ii in failed:
+        print('Union of geometry {0:d} failed, leaving it out'.format(ii))
+    return result
@@ -52,7 +52,10 @@ def process_operation(operation, ii, destination):
     
 def process_design(design,subdir,slugified_name):
     title = slugified_name
-    operations = [process_operation(operation, ii, subdir) for ii, operation in enumerate(design.operations)]
+    operations = []
+    for ii, operation in enumerate(design.operations):
+        design.pull_output(operation)
+        operations.append(process_operation(operation, ii, subdir))
 
     ii = design.operation_index(design.main_operation[0])
 
@@ -54,8 +54,7 @@ def cross_section(layerdef, sketch, parent, scale_value):
                 yshift = layerdef.z_values[layerid] * popupcad.csg_processing_scaling * scale_value
                 layer = result.layer_sequence[layerid]
                 thickness = layerid.thickness * popupcad.csg_processing_scaling * scale_value
-                newgeoms = [item for item in layer.geoms]
-                newgeoms = [aff.affine_transform(item, a) for item in newgeoms]
+                newgeoms = popupcad.algorithms.csg_shapely.affine_transform_all(layer.geoms, a)
                 newgeoms2 = []
                 for geom in newgeoms:
                     newgeom = sg.box(geom.coords[0][0],
@@ -73,23 +72,24 @@ def cross_section(layerdef, sketch, parent, scale_value):
 
 def transform_csg(layerdef_from,layerdef_to,inshift,outshift,step,geom_from,geoms_to,csg_laminate,scale_x,scale_y):
     from popupcad.filetypes.laminate import Laminate
-    import shapely.affinity as aff
     from popupcad.algorithms.points import calctransformfrom2lines
 
     lsout = Laminate(layerdef_to)
 
+    transforms = []
+    for geom in geoms_to:
+        try:
+            from_line = geom_from.exteriorpoints(scaling = popupcad.csg_processing_scaling)
+            to_line = geom.exteriorpoints(scaling = popupcad.csg_processing_scaling)
+            transforms.append(calctransformfrom2lines(from_line,to_line,scale_x=scale_x,scale_y=scale_y))
+        except IndexError:
+            pass
+
     for layer_from,layer_to in zip(layerdef_from.layers[::step][inshift:], layerdef_to.layers[outshift:]):
         newgeoms = []
-        for geom in geoms_to:
-            for designgeom in csg_laminate.layer_sequence[layer_from].geoms:
-                try:
-                    from_line = geom_from.exteriorpoints(scaling = popupcad.csg_processing_scaling)
-                    to_line = geom.exteriorpoints(scaling = popupcad.csg_processing_scaling)
-                    transform = calctransformfrom2lines(from_line,to_line,scale_x=scale_x,scale_y=scale_y)
-                    transformed_geom = aff.affine_transform(designgeom,transform)
-                    newgeoms.append(transformed_geom)
-                except IndexError:
-                    pass
+        designgeoms = csg_laminate.layer_sequence[layer_from].geoms
+        for transform in transforms:
+            newgeoms.extend(popupcad.algorithms.csg_shapely.affine_transform_all(designgeoms, transform))
         result1 = popupcad.algorithms.csg_shapely.unary_union_safe(newgeoms)
         results2 = popupcad.algorithms.csg_shapely.condition_shapely_entities(result1)
         lsout.replacelayergeoms(layer_to, results2)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+"""
+import io
+import pickle
+import queue
+import multiprocessing
+import popupcad
+
+_worker_design = None
+
+def shared_objects(design):
+    '''objects whose identity matters on both sides, keyed by a reference that survives the trip between processes'''
+    layerdef = design.return_layer_definition()
+    objects = {}
+    objects[('design', None)] = design
+    objects[('layerdef', None)] = layerdef
+    for layer in layerdef.layers:
+        objects[('layer', layer.id)] = layer
+    for op in design.operations:
+        objects[('operation', op.id)] = op
+    return objects
+
+class DesignPickler(pickle.Pickler):
+    '''pickles results without dragging along the design, its layers or its operations, which are replaced by references'''
+
+    def __init__(self, file, design):
+        super(DesignPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.references = dict([(id(value), key) for key, value in shared_objects(design).items()])
+
+    def persistent_id(self, obj):
+        return self.references.get(id(obj))
+
+class DesignUnpickler(pickle.Unpickler):
+    '''resolves references written by DesignPickler against the local copy of the design'''
+
+    def __init__(self, file, design):
+        super(DesignUnpickler, self).__init__(file)
+        self.objects = shared_objects(design)
+
+    def persistent_load(self, pid):
+        return self.objects[tuple(pid)]
+
+def dumps(item, design):
+    f = io.BytesIO()
+    DesignPickler(f, design).dump(item)
+    return f.getvalue()
+
+def loads(data, design):
+    return DesignUnpickler(io.BytesIO(data), design).load()
+
+def _init_worker(design_data):
+    global _worker_design
+    popupcad.regeneration_processes = 1
+    _worker_design = pickle.loads(design_data)
+    _worker_design.update_operation_design()
+
+def _generate(op_ref, parent_data):
+    from popupcad.filetypes.operationoutput import OperationOutput
+    design = _worker_design
+    parent_outputs = loads(parent_data, design)
+    for parent_ref, outputs in parent_outputs.items():
+        parent = design.op_from_ref(parent_ref)
+        parent.output = [OperationOutput(csg, name, parent) for csg, name in outputs]
+
+    op = design.op_from_ref(op_ref)
+    op.clear_output()
+    state = popupcad.algorithms.regen_disk_cache.generate_with_state(op)
+    return dumps(state, design)
+
+def reprocess(design, operations, processes, progress=None):
+    '''
+    regenerate operations in dependency order, sending independent branches to a pool of worker processes.
+    operations which are not parallel_safe are generated in this process as soon as their parents are done.
+    progress is called with each finished operation; an exception it raises stops the pool.
+    '''
+    op_set = set(operations)
+    waiting_on = {}
+    children = dict([(op, []) for op in operations])
+    for op in operations:
+        parents = set([design.op_from_ref(ref) for ref in op.parentrefs()])
+        waiting_on[op] = parents & op_set
+        for parent in waiting_on[op]:
+            children[parent].append(op)
+
+    ready = [op for op in operations if not waiting_on[op]]
+    results = queue.Queue()
+    running = 0
+    error = None
+
+    def finished(op):
+        op.dirty = False
+        if progress is not None:
+            progress(op)
+        for child in children[op]:
+            waiting_on[child].discard(op)
+            if not waiting_on[child]:
+                ready.append(child)
+
+    # pickled in one piece so that the layer definition stays the one frozen geometry is keyed by
+    design_data = pickle.dumps(design.copy_for_evaluation(), pickle.HIGHEST_PROTOCOL)
+    pool = multiprocessing.Pool(processes, _init_worker, (design_data,))
+    try:
+        while (ready and error is None) or running > 0:
+            while ready and error is None:
+                op = ready.pop(0)
+                key, current = design.check_regen_cache(op)
+                if current:
+                    finished(op)
+                    continue
+                op.regen_key = None
+                if op.parallel_safe:
+                    parent_outputs = {}
+                    for ref in op.parentrefs():
+                        parent_outputs[ref] = [(output.csg, output.name) for output in design.op_from_ref(ref).output]
+                    pool.apply_async(
+                        _generate, (op.id, dumps(parent_outputs, design)),
+                        callback=lambda result, op=op, key=key: results.put((op, key, result, None)),
+                        error_callback=lambda ex, op=op, key=key: results.put((op, key, None, ex)))
+                    running += 1
+                else:
+                    try:
+                        state = popupcad.algorithms.regen_disk_cache.generate_with_state(op)
+                    except Exception as ex:
+                        error = ex
+                        break
+                    op.regen_key = key
+                    popupcad.algorithms.regen_disk_cache.store(design, op, key, state)
+                    finished(op)
+
+            if running > 0:
+                op, key, result, ex = results.get()
+                running -= 1
+                if ex is not None:
+                    if error is None:
+                        error = ex
+                    continue
+                for name, value in loads(result, design).items():
+                    setattr(op, name, value)
+                op.regen_key = key
+                popupcad.algorithms.regen_disk_cache.store(design, op, key, result)
+                finished(op)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    if error is not None:
+        raise error
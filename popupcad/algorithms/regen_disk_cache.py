@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+"""
+import os
+import pickle
+import popupcad
+from popupcad.algorithms import content_hash
+from popupcad.algorithms import csg_shapely
+from popupcad.algorithms import parallel_regen
+
+excluded_state = ['_design', '_regen_key', '_dirty']
+extension = '.regen'
+
+#increase whenever a change to the code alters what operations generate or how entries are stored,
+#so that entries written by earlier code are no longer found
+format_version = 2
+
+#bytes of entries in each cache directory, as far as this process knows. scanned once per directory,
+#kept up to date by store and remove, and scanned again by evict, which corrects for other processes sharing the directory
+_cache_sizes = {}
+
+#once the limit is crossed, entries are evicted down to this fraction of it, so that the directory is not listed on every store
+evict_to = .8
+
+def changed_state(op, before):
+    '''the attributes of op added or replaced since before, a copy of its __dict__, was taken'''
+    state = {}
+    for name, value in op.__dict__.items():
+        if name in excluded_state:
+            continue
+        if name not in before or before[name] is not value:
+            state[name] = value
+    return state
+
+def generate_with_state(op):
+    '''generate op and return the attributes the generation added or replaced'''
+    before = op.__dict__.copy()
+    op.generate_outer1()
+    return changed_state(op, before)
+
+def cache_dir():
+    return os.path.normpath(popupcad.regeneration_cache_dir)
+
+def filename(key):
+    disk_key = content_hash.hash_strings(format_version, csg_shapely.grid_size(), key)
+    return os.path.join(cache_dir(), disk_key + extension)
+
+def enabled(key):
+    return key is not None and popupcad.regeneration_disk_cache
+
+def load(design, op, key):
+    '''restore op's generated state from disk. returns whether an entry was found'''
+    if not enabled(key):
+        return False
+    path = filename(key)
+    try:
+        with open(path, 'rb') as f:
+            state = parallel_regen.loads(f.read(), design)
+    except FileNotFoundError:
+        return False
+    except (OSError, EOFError, KeyError, AttributeError, ImportError, TypeError, ValueError, pickle.UnpicklingError):
+        remove(path)
+        return False
+    for name, value in state.items():
+        setattr(op, name, value)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return True
+
+def store(design, op, key, state):
+    '''write op's generated state to disk, where state is either a dict or data already pickled by parallel_regen.dumps'''
+    if not enabled(key):
+        return
+    if isinstance(state, dict):
+        try:
+            state = parallel_regen.dumps(state, design)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+    path = filename(key)
+    temp_path = path + '.tmp'
+    try:
+        if not os.path.isdir(cache_dir()):
+            os.makedirs(cache_dir())
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        with open(temp_path, 'wb') as f:
+            f.write(state)
+        os.replace(temp_path, path)
+    except OSError:
+        remove(temp_path)
+        return
+    if cache_size() + len(state) - replaced > popupcad.regeneration_disk_cache_limit:
+        evict(popupcad.regeneration_disk_cache_limit * evict_to)
+    else:
+        _cache_sizes[cache_dir()] += len(state) - replaced
+
+def remove(path):
+    try:
+        size = os.stat(path).st_size
+        os.remove(path)
+    except OSError:
+        return
+    directory = os.path.dirname(path)
+    if path.endswith(extension) and directory in _cache_sizes:
+        _cache_sizes[directory] -= size
+
+def entries():
+    '''(modification time, size, path) of every entry in the cache directory'''
+    entries = []
+    if not os.path.isdir(cache_dir()):
+        return entries
+    for name in os.listdir(cache_dir()):
+        if not name.endswith(extension):
+            continue
+        path = os.path.join(cache_dir(), name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+def cache_size():
+    '''bytes of entries in the cache directory, without listing it again once it has been scanned'''
+    directory = cache_dir()
+    if directory not in _cache_sizes:
+        _cache_sizes[directory] = sum([size for mtime, size, path in entries()])
+    return _cache_sizes[directory]
+
+def evict(limit=None):
+    '''delete the least recently used entries until the cache fits within limit bytes'''
+    if limit is None:
+        limit = popupcad.regeneration_disk_cache_limit
+    directory = cache_dir()
+    _cache_sizes.pop(directory, None)
+    items = entries()
+    total = sum([size for mtime, size, path in items])
+    for mtime, size, path in sorted(items):
+        if total <= limit:
+            break
+        remove(path)
+        total -= size
+    _cache_sizes[directory] = total
+
+def clear():
+    evict(0)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+"""
+import csv
+import json
+import time
+import tracemalloc
+import popupcad
+
+def count_vertices(geom):
+    try:
+        return sum([count_vertices(item) for item in geom.geoms])
+    except AttributeError:
+        pass
+    try:
+        return len(geom.exterior.coords) + sum([len(item.coords) for item in geom.interiors])
+    except AttributeError:
+        return len(geom.coords)
+
+def geometry_counts(laminates):
+    '''
+    number of geometries and vertices in each layer, summed over laminates.
+    layers are keyed by (index, name), since layer names need not be unique.
+    '''
+    counts = {}
+    for laminate in laminates:
+        for ii, layer in enumerate(laminate.layerdef.layers):
+            key = (ii, str(layer))
+            geoms = laminate.layer_sequence[layer].geoms
+            polygons, vertices = counts.get(key, (0, 0))
+            counts[key] = (polygons + len(geoms), vertices + sum([count_vertices(geom) for geom in geoms]))
+    return counts
+
+def layer_label(key):
+    return '{0}:{1}'.format(*key)
+
+def input_laminates(design, op):
+    laminates = []
+    for ref, output_index in op.outputrefs():
+        try:
+            laminates.append(design.op_from_ref(ref).output[output_index].csg)
+        except (AttributeError, IndexError):
+            pass
+    return laminates
+
+def output_laminates(op):
+    try:
+        return [output.csg for output in op.output]
+    except AttributeError:
+        return []
+
+class OperationProfile(object):
+    fields = ['operation', 'type', 'wall_time', 'cpu_time', 'memory_peak', 'input_polygons', 'input_vertices', 'output_polygons', 'output_vertices']
+
+    def __init__(self, operation, type_name, wall_time, cpu_time, memory_peak, input_layers, output_layers):
+        self.operation = operation
+        self.type = type_name
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.memory_peak = memory_peak
+        self.input_layers = input_layers
+        self.output_layers = output_layers
+
+    @property
+    def input_polygons(self):
+        return sum([polygons for polygons, vertices in self.input_layers.values()])
+
+    @property
+    def input_vertices(self):
+        return sum([vertices for polygons, vertices in self.input_layers.values()])
+
+    @property
+    def output_polygons(self):
+        return sum([polygons for polygons, vertices in self.output_layers.values()])
+
+    @property
+    def output_vertices(self):
+        return sum([vertices for polygons, vertices in self.output_layers.values()])
+
+    def to_dict(self):
+        data = dict([(field, getattr(self, field)) for field in self.fields])
+        data['input_layers'] = dict([(layer_label(layer), {'polygons': polygons, 'vertices': vertices}) for layer, (polygons, vertices) in self.input_layers.items()])
+        data['output_layers'] = dict([(layer_label(layer), {'polygons': polygons, 'vertices': vertices}) for layer, (polygons, vertices) in self.output_layers.items()])
+        return data
+
+class RegenerationReport(object):
+    '''
+    per-operation cost of one call to Design.reprocessoperations, with every operation generated from scratch:
+    wall and cpu time in seconds, and polygon and vertex counts per layer of the inputs and outputs.
+    with trace_memory, which defaults to popupcad.regeneration_profile_memory, each operation is generated a second time
+    under tracemalloc to record its peak memory in bytes, so that tracing does not slow down the timed pass.
+    tracemalloc only sees allocations made through python; memory geos allocates for geometry is not included.
+    '''
+    def __init__(self, trace_memory=None):
+        if trace_memory is None:
+            trace_memory = popupcad.regeneration_profile_memory
+        self.trace_memory = trace_memory
+        self.profiles = []
+
+    def measure(self, design, op):
+        '''regenerate op without using cached outputs and record what it cost'''
+        input_layers = geometry_counts(input_laminates(design, op))
+        wall_before = time.perf_counter()
+        cpu_before = time.process_time()
+        try:
+            design.regenerate_operation(op, use_cache=False)
+        finally:
+            wall_time = time.perf_counter() - wall_before
+            cpu_time = time.process_time() - cpu_before
+            output_layers = geometry_counts(output_laminates(op))
+            self.profiles.append(OperationProfile(str(op), type(op).__name__, wall_time, cpu_time, None, input_layers, output_layers))
+        if self.trace_memory:
+            self.profiles[-1].memory_peak = self.measure_memory(design, op)
+
+    def measure_memory(self, design, op):
+        '''peak python memory allocated while regenerating op once more'''
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+            design.regenerate_operation(op, use_cache=False)
+            return tracemalloc.get_traced_memory()[1] - memory_before
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    def sorted(self, field='wall_time', reverse=True):
+        return sorted(self.profiles, key=lambda profile: getattr(profile, field) or 0, reverse=reverse)
+
+    @property
+    def total_wall_time(self):
+        return sum([profile.wall_time for profile in self.profiles])
+
+    def layer_keys(self):
+        keys = []
+        for profile in self.profiles:
+            for key in list(profile.input_layers.keys()) + list(profile.output_layers.keys()):
+                if key not in keys:
+                    keys.append(key)
+        return sorted(keys)
+
+    def to_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump([profile.to_dict() for profile in self.profiles], f, indent=2)
+
+    def to_csv(self, filename):
+        layer_keys = self.layer_keys()
+        header = OperationProfile.fields[:]
+        for key in layer_keys:
+            label = layer_label(key)
+            header.extend([label + ' input polygons', label + ' input vertices', label + ' output polygons', label + ' output vertices'])
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for profile in self.profiles:
+                row = [getattr(profile, field) for field in OperationProfile.fields]
+                for key in layer_keys:
+                    row.extend(profile.input_layers.get(key, (0, 0)))
+                    row.extend(profile.output_layers.get(key, (0, 0)))
+                writer.writerow(row)
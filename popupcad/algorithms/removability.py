@@ -4,21 +4,16 @@ Written by Daniel M. Aukes and CONTRIBUTORS
 Email: danaukes<at>asu.edu.
 Please see LICENSE for full license.
 """
-from popupcad.filetypes.layer import Layer
-from popupcad.filetypes.laminate import Laminate
-
 def one_way_up(laminatein):
-    l = Layer([])
-    laminateout = Laminate(laminatein.layerdef)
-    for ii, geoms in enumerate(laminatein):
-        l = l.union(geoms)
-        laminateout[ii] = l
-    laminateout = modify_up(laminateout)
+    up, down = laminatein.cumulative_unions()
+    laminateout = modify_up(up.copy())
     return laminateout
 
 
 def one_way_down(laminatein):
-    return one_way_up(laminatein.flip()).flip()
+    #the upward scan of the flipped laminate is the flipped downward scan
+    up, down = laminatein.cumulative_unions()
+    return modify_up(down.flip()).flip()
 
 
 def two_way(laminatein):
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+
+Load, upgrade, regenerate and export designs without a QApplication,
+one design per worker process:
+
+    python -m popupcad.batch designs/*.cad --export dxf svg --operations -1
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+import popupcad
+from popupcad.filetypes.design import Design
+
+export_formats = ['dxf', 'svg', 'stl']
+
+def find_files(patterns):
+    filenames = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '**', '*.cad')
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if len(matches) == 0 and os.path.isfile(pattern):
+            matches = [pattern]
+        for filename in matches:
+            filename = os.path.normpath(os.path.abspath(filename))
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+def find_outputs(design, selections):
+    '''
+    operation outputs named by selections, which are operation indices or names, optionally followed by :output_index.
+    '''
+    outputs = []
+    for selection in selections:
+        name, separator, output_index = selection.rpartition(':')
+        if not separator or not output_index.lstrip('-').isdigit():
+            name, output_index = selection, '0'
+        try:
+            operation = design.operations[int(name)]
+        except ValueError:
+            matches = [op for op in design.operations if str(op) == name]
+            if len(matches) == 0:
+                raise KeyError('no operation named ' + name)
+            operation = matches[0]
+        outputs.append((operation, int(output_index)))
+    return outputs
+
+def export_output(design, operation, output_index, formats, directory):
+    output = operation.output[output_index]
+    generic = output.generic_laminate()
+    basename = os.path.splitext(design.get_basename())[0] + '_' + str(operation)
+    if output_index != 0:
+        basename += '_' + str(output_index)
+    filenames = []
+    if 'dxf' in formats:
+        generic.save_dxf(basename, directory=directory)
+        filenames.append(os.path.normpath(os.path.join(directory, basename + '.dxf')))
+    if 'svg' in formats:
+        filenames.extend(generic.save_svg(basename, directory=directory))
+    if 'stl' in formats:
+        exportdir = popupcad.exportdir
+        popupcad.exportdir = directory
+        try:
+            generic.toSTL()
+        finally:
+            popupcad.exportdir = exportdir
+        filename = os.path.normpath(os.path.join(directory, basename + '.stl'))
+        os.replace(os.path.join(directory, str(generic.id) + '.stl'), filename)
+        filenames.append(filename)
+    return filenames
+
+def process_file(filename, upgrade=True, formats=(), selections=('-1',), directory=None):
+    '''run one design through the pipeline, returning timings and any error instead of raising'''
+    result = {'filename': filename, 'passed': False, 'error': None, 'traceback': None, 'exported': [], 'times': {}}
+    stage = 'load'
+    t0 = time.perf_counter()
+    try:
+        design = Design.load_yaml(filename, upgrade=False)
+        result['times']['load'] = time.perf_counter() - t0
+
+        if upgrade:
+            stage = 'upgrade'
+            t0 = time.perf_counter()
+            design.backup(popupcad.backupdir, '_pre-upgrade_')
+            design = design.upgrade()
+            design.update_operation_design()
+            result['times']['upgrade'] = time.perf_counter() - t0
+
+        stage = 'regenerate'
+        t0 = time.perf_counter()
+        design.reprocessoperations()
+        result['times']['regenerate'] = time.perf_counter() - t0
+
+        if len(formats) > 0:
+            stage = 'export'
+            t0 = time.perf_counter()
+            if directory is None:
+                directory = popupcad.exportdir
+            for operation, output_index in find_outputs(design, selections):
+                result['exported'].extend(export_output(design, operation, output_index, formats, directory))
+            result['times']['export'] = time.perf_counter() - t0
+
+        result['passed'] = True
+    except Exception as ex:
+        result['error'] = '{0} failed: {1}: {2}'.format(stage, type(ex).__name__, ex)
+        result['traceback'] = traceback.format_exc()
+    result['times']['total'] = sum(result['times'].values())
+    return result
+
+def _process_file(args):
+    return process_file(*args)
+
+def _init_worker():
+    popupcad.regeneration_processes = 1
+
+def run(filenames, processes=None, upgrade=True, formats=(), selections=('-1',), directory=None, callback=None):
+    '''process filenames across a pool of workers, returning one result per file in the order given'''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(filenames)))
+    jobs = [(filename, upgrade, tuple(formats), tuple(selections), directory) for filename in filenames]
+    results = []
+    if processes == 1:
+        _init_worker()
+        for job in jobs:
+            results.append(_process_file(job))
+            if callback is not None:
+                callback(results[-1])
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker)
+        try:
+            for result in pool.imap(_process_file, jobs):
+                results.append(result)
+                if callback is not None:
+                    callback(result)
+        finally:
+            pool.terminate()
+            pool.join()
+    return results
+
+def summary(results):
+    stages = ['load', 'upgrade', 'regenerate', 'export', 'total']
+    lines = []
+    lines.append('{0:>8} '.format('status') + ' '.join(['{0:>10}'.format(stage) for stage in stages]) + '  file')
+    for result in results:
+        status = 'passed' if result['passed'] else 'FAILED'
+        times = ['{0:>10}'.format('{0:.2f}'.format(result['times'][stage]) if stage in result['times'] else '-') for stage in stages]
+        lines.append('{0:>8} '.format(status) + ' '.join(times) + '  ' + result['filename'])
+    for result in results:
+        if not result['passed']:
+            lines.append('')
+            lines.append(result['filename'] + ': ' + result['error'])
+    passed = len([result for result in results if result['passed']])
+    lines.append('')
+    lines.append('{0} passed, {1} failed, {2:.2f} s total'.format(passed, len(results) - passed, sum([result['times']['total'] for result in results])))
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m popupcad.batch', description='Load, upgrade, regenerate and export popupCAD designs.')
+    parser.add_argument('files', nargs='+', help='design files, globs or directories to search for .cad files')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='number of worker processes, one design each (default: cpu count)')
+    parser.add_argument('--no-upgrade', dest='upgrade', action='store_false', help='regenerate files as saved, without upgrading them')
+    parser.add_argument('-e', '--export', nargs='+', choices=export_formats, default=[], help='export formats')
+    parser.add_argument('-o', '--operations', nargs='+', default=['-1'], help='operations to export, by index or name, optionally followed by :output_index (default: -1)')
+    parser.add_argument('-d', '--directory', default=None, help='export directory (default: popupcad.exportdir)')
+    parser.add_argument('--json', default=None, help='write the per-file results to this file')
+    args = parser.parse_args(argv)
+
+    filenames = find_files(args.files)
+    if len(filenames) == 0:
+        parser.error('no design files found')
+    if args.directory is not None and not os.path.isdir(args.directory):
+        os.makedirs(args.directory)
+
+    def progress(result):
+        print(('passed ' if result['passed'] else 'FAILED ') + result['filename'])
+
+    results = run(filenames, args.processes, args.upgrade, args.export, args.operations, args.directory, progress)
+    print(summary(results))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if all([result['passed'] for result in results]) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
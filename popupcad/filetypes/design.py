@@ -7,6 +7,7 @@ Please see LICENSE for full license.
 import popupcad
 from popupcad.filetypes.popupcad_file import popupCADFile
 from dev_tools.acyclicdirectedgraph import AcyclicDirectedGraph
+from popupcad.filetypes.operation_registry import OperationRegistry
 import yaml
 import os
 
@@ -17,6 +18,10 @@ class NoOperation(Exception):
     def __init__(self):
         Exception.__init__(self, 'No Parent Operation')
 
+class RegenCancelled(Exception):
+    def __init__(self):
+        Exception.__init__(self, 'Regeneration Cancelled')
+
 class RegenFailure(Exception):
     def __init__(self,other_exceptions):
         Exception.__init__(self, 'Regen Failure',[str(item) for item in other_exceptions])
@@ -61,10 +66,32 @@ class Design(popupCADFile):
             del self.__layerdef
             return self._layerdef
 
+    def registry(self):
+        '''lookup tables for the operation list, rebuilt whenever the list has been changed directly'''
+        try:
+            if self._registry.is_current(self.operations):
+                return self._registry
+        except AttributeError:
+            pass
+        self._registry = OperationRegistry(self.operations)
+        return self._registry
+
+    def operation_changed(self, operation):
+        try:
+            self._registry.update(operation)
+        except AttributeError:
+            pass
+
     def operation_index(self, operation_ref):
         try:
-            indeces = dict([(op.id, ii) for ii, op in enumerate(self.operations)])
-            return indeces[operation_ref]
+            ii = self._registry.position(operation_ref)
+            if self.operations[ii].id == operation_ref:
+                return ii
+        except (AttributeError, KeyError, IndexError):
+            pass
+        self._registry = OperationRegistry(self.operations)
+        try:
+            return self._registry.position(operation_ref)
         except KeyError:
             raise(NoOperation)
 
@@ -73,43 +100,34 @@ class Design(popupCADFile):
 
     @property
     def operation_dict(self):
-        return dict([(item.id,item) for item in self.operations])
+        return self.registry().by_id.copy()
 
-    def replace_op_refs_force(self, oldref, newref):
+    def replace_refs(self, kind, oldref, newref, method_name):
+        registry = self.registry()
+        if kind == 'output':
+            key = tuple(oldref)
+        else:
+            key = oldref
         failed_ops = []
-        for op in self.operations:
+        for op in registry.find_users(kind, key):
             try:
-                op.replace_op_refs(oldref, newref)
+                getattr(op, method_name)(oldref, newref)
             except AttributeError:
                 failed_ops.append(op)
+            registry.update(op)
         return failed_ops
 
+    def replace_op_refs_force(self, oldref, newref):
+        return self.replace_refs('output', oldref, newref, 'replace_op_refs')
+
     def replace_op_refs2(self, oldref, newref):
-        failed_ops = []
-        for op in self.operations:
-            try:
-                op.replace_op_refs2(oldref, newref)
-            except AttributeError:
-                failed_ops.append(op)
-        return failed_ops
+        return self.replace_refs('operation', oldref, newref, 'replace_op_refs2')
 
     def replace_sketch_refs_force(self, oldref, newref):
-        failed_ops = []
-        for op in self.operations:
-            try:
-                op.replace_sketch_refs(oldref, newref)
-            except AttributeError:
-                failed_ops.append(op)
-        return failed_ops
+        return self.replace_refs('sketch', oldref, newref, 'replace_sketch_refs')
 
     def replace_subdesign_refs(self, oldref, newref):
-        failed_ops = []
-        for op in self.operations:
-            try:
-                op.replace_subdesign_refs(oldref, newref)
-            except AttributeError:
-                failed_ops.append(op)
-        return failed_ops
+        return self.replace_refs('subdesign', oldref, newref, 'replace_subdesign_refs')
 
     def replace_op_refs(self, oldref, newref):
         self.build_tree()
@@ -134,8 +152,7 @@ class Design(popupCADFile):
                     newop) + ' is below a child of ' + str(oldop) + '. Please move up.'
                 raise UpgradeError
 
-        for op in self.operations:
-            failed_ops = self.replace_op_refs_force(oldref, newref)
+        failed_ops = self.replace_op_refs_force(oldref, newref)
         if not not failed_ops:
             error_string = 'Some operations cannot be updated'
             message_string = 'Please update manually.'
@@ -167,6 +184,35 @@ class Design(popupCADFile):
         self.copy_file_params(new, identical)
         return new
 
+    def copy_for_evaluation(self):
+        '''
+        a copy whose operations can be rewired and regenerated without touching this design.
+        sketches, subdesigns and the layer definition are shared, since regeneration only reads them.
+        '''
+        operations = [operation.copy_wrapper() for operation in self.operations]
+        data = popupcad.algorithms.parallel_regen.dumps(operations, self)
+        operations = popupcad.algorithms.parallel_regen.loads(data, self)
+        new = type(self)(operations,self.return_layer_definition(),self.sketches.copy(),self.subdesigns)
+        new.subdesigns_are_reprocessed = self.subdesigns_are_reprocessed
+        new.id = self.id
+        return new
+
+    def copy_for_regeneration(self):
+        '''
+        a copy to regenerate away from the gui thread while this design stays free to be read and edited.
+        operations start out with this design's outputs, keys and dirty flags, so only what is out of date gets generated.
+        sketches and subdesigns are copied too, since they are edited in place.
+        '''
+        new = self.copy_for_evaluation()
+        new.sketches = dict([(key, value.copy(identical=True)) for key, value in self.sketches.items()])
+        new.subdesigns = dict([(key, value.copy_for_regeneration()) for key, value in self.subdesigns.items()])
+        for operation, new_operation in zip(self.operations, new.operations):
+            new_operation.dirty = operation.dirty
+            if operation.has_output():
+                new_operation.output = operation.output
+                new_operation.regen_key = operation.regen_key
+        return new
+
     def upgrade(self, identical=True):
         samesame = False
         operations_old = self.operations
@@ -264,17 +310,28 @@ class Design(popupCADFile):
     def subdesigns_are_reprocessed(self,value):
         self._subdesigns_are_reprocessed = value
 
-    def reprocessoperations(self, operations=None,debugprint = False):
+    def reprocessoperations(self, operations=None,debugprint = False,processes = None,decendents = True,profile = False,progress = None):
+        '''
+        regenerate operations and their decendents.
+        progress, if given, is called with each operation once it is done and may raise RegenCancelled to stop.
+        '''
         self.build_tree()
         self.update_operation_design()
-            
+
+        if processes is None:
+            processes = popupcad.regeneration_processes
+        if profile:
+            processes = 1
+
         if not self.subdesigns_are_reprocessed:
             for subdesign in self.subdesigns.values():
-                subdesign.reprocessoperations()
+                subdesign.reprocessoperations(processes = processes)
             self.subdesigns_are_reprocessed=True
 
         if operations is None:
             operations = self.operations
+        elif not decendents:
+            operations = [op for op in self.operations if op in operations]
         else:
             all_decendents = operations+[item for operation in operations for item in operation.decendents()]
             all_decendents = list(set(all_decendents))
@@ -282,22 +339,112 @@ class Design(popupCADFile):
 
         if debugprint:
             print(operations)
-            
-        for op in operations:
-            op.generate_outer1()
+
+        self._content_keys = {}
+        self._subdesign_outputs = {}
+        if processes > 1:
+            popupcad.algorithms.parallel_regen.reprocess(self, operations, processes, progress)
+        elif profile:
+            report = popupcad.algorithms.regen_profiler.RegenerationReport()
+            try:
+                for op in operations:
+                    report.measure(self, op)
+                    if progress is not None:
+                        progress(op)
+            finally:
+                self.regeneration_report = report
+        else:
+            for op in operations:
+                self.regenerate_operation(op)
+                if progress is not None:
+                    progress(op)
+
+    def regenerate_operation(self, op, use_cache=True):
+        '''
+        regenerate a single operation unless a cached output is available. returns whether the cache was used.
+        with use_cache False the operation is always generated, and its output is still stored for later reuse.
+        the operation stays dirty if generating it raises, so the next pull tries it again instead of using its old output.
+        '''
+        if use_cache:
+            key, current = self.check_regen_cache(op)
+        elif popupcad.regeneration_cache:
+            key, current = op.content_key(self), False
+        else:
+            key, current = None, False
+        if not current:
+            op.regen_key = None
+            state = popupcad.algorithms.regen_disk_cache.generate_with_state(op)
+            op.regen_key = key
+            popupcad.algorithms.regen_disk_cache.store(self, op, key, state)
+        op.dirty = False
+        return current
+
+    def mark_dirty(self, operations):
+        '''flag operations and everything downstream of them as out of date without regenerating anything'''
+        self.build_tree()
+        for operation in operations:
+            operation.dirty = True
+            for item in operation.decendents():
+                item.dirty = True
+
+    def needs_regeneration(self, operation):
+        '''the operation and its ancestors which are dirty or have never been generated'''
+        self.build_tree()
+        return [item for item in operation.ancestors()+[operation] if item.dirty or not item.has_output()]
+
+    def pull_output(self, operation, progress = None):
+        '''regenerate only what the output of operation depends on'''
+        needed = self.needs_regeneration(operation)
+        if len(needed)>0:
+            self.reprocessoperations(needed,decendents = False,progress = progress)
+
+    def check_regen_cache(self, op):
+        '''returns the operation's content key and whether its existing output was generated from the same key'''
+        if not popupcad.regeneration_cache:
+            return None, False
+        key = op.content_key(self)
+        current = key is not None and key == op.regen_key and op.has_output()
+        if key is not None and not current:
+            current = popupcad.algorithms.regen_disk_cache.load(self, op, key)
+            if current:
+                op.regen_key = key
+        return key, current
+
+    def content_key(self, item):
+        '''hash of a sketch, subdesign or layer definition, computed once per regeneration'''
+        try:
+            return self._content_keys[id(item)]
+        except AttributeError:
+            self._content_keys = {}
+        except KeyError:
+            pass
+        key = popupcad.algorithms.content_hash.hash_file_object(item)
+        self._content_keys[id(item)] = key
+        return key
+
+    def subdesign_outputs(self):
+        '''outputs of subdesign evaluations by evaluation key, shared by the operations regenerated together'''
+        try:
+            return self._subdesign_outputs
+        except AttributeError:
+            self._subdesign_outputs = {}
+            return self._subdesign_outputs
 
     def append_operation(self,item):
         item.set_design(self)
+        self.registry().append(item)
         return self.operations.append(item)
 
     def insert_operation(self,index,item):
         item.set_design(self)
+        self.registry().insert(index,item)
         return self.operations.insert(index,item)
 
     def remove_operation(self,item):
-        return self.operations.remove(item)
+        return self.pop_operation(self.operations.index(item))
 
     def pop_operation(self,ii):
+        self.registry().pop(ii)
         return self.operations.pop(ii)
                 
     def build_tree(self):
@@ -310,18 +457,12 @@ class Design(popupCADFile):
         return tree
 
     def cleanup_subdesigns(self):
-        subdesignrefs = []
-        for op in self.operations:
-            subdesignrefs.extend(op.subdesignrefs())
-        unused = set(self.subdesigns.keys()) - set(subdesignrefs)
+        unused = set(self.subdesigns.keys()) - self.registry().used_refs('subdesign')
         for key in unused:
             self.subdesigns.pop(key)
 
     def cleanup_sketches(self):
-        sketchrefs = []
-        for op in self.operations:
-            sketchrefs.extend(op.sketchrefs())
-        unused = set(self.sketches.keys()) - set(sketchrefs)
+        unused = set(self.sketches.keys()) - self.registry().used_refs('sketch')
         for key in unused:
             self.sketches.pop(key)
 
@@ -27,7 +27,7 @@ class GenericLaminate(object):
         from popupcad.filetypes.laminate import Laminate
         new = Laminate(self.layerdef)
         for ii, layer in enumerate(self.layerdef.layers):
-            geoms = [item.to_shapely() for item in self.geoms[layer]]
+            geoms = popupcad.algorithms.csg_shapely.to_shapely_all(self.geoms[layer])
             new.replacelayergeoms(layer, geoms)
         return new
 
@@ -125,6 +125,59 @@ class GenericLaminate(object):
         if not separate_files:
             dwg.saveas(filename)     
     
+    def save_svg(self,basename,separate_files=True,directory = None):
+        '''write the outline of each layer as svg without going through a qt scene'''
+        if directory is None:
+            directory = popupcad.exportdir
+
+        layer_paths = []
+        xs = []
+        ys = []
+        for ii,layer in enumerate(self.layerdef.layers):
+            layername = '{:03.0f}_'.format(ii)+layer.name
+            paths = []
+            for item in self.geoms[layer]:
+                if item.is_construction():
+                    continue
+                closed = item.segments()==item.segments_closed()
+                for loop in [item.exteriorpoints()]+item.interiorpoints():
+                    if len(loop)==0:
+                        continue
+                    xs.extend([x for x,y in loop])
+                    ys.extend([y for x,y in loop])
+                    path = 'M '+' L '.join(['{0:.6f},{1:.6f}'.format(x,-y) for x,y in loop])
+                    if closed:
+                        path+=' Z'
+                    paths.append(path)
+            layer_paths.append((layername,paths))
+
+        if len(xs)>0:
+            viewbox = '{0:.6f} {1:.6f} {2:.6f} {3:.6f}'.format(min(xs),-max(ys),max(xs)-min(xs),max(ys)-min(ys))
+        else:
+            viewbox = '0 0 0 0'
+
+        def write(filename,layers):
+            with open(filename,'w') as f:
+                f.write('<svg xmlns="http://www.w3.org/2000/svg" viewBox="{0}">\n'.format(viewbox))
+                for layername,paths in layers:
+                    f.write('<g id="{0}" fill="none" stroke="black" stroke-width="0.1%">\n'.format(layername))
+                    for path in paths:
+                        f.write('<path fill-rule="evenodd" d="{0}"/>\n'.format(path))
+                    f.write('</g>\n')
+                f.write('</svg>\n')
+
+        filenames = []
+        if separate_files:
+            for layername,paths in layer_paths:
+                filename = os.path.normpath(os.path.join(directory,basename+'_'+layername+'.svg'))
+                write(filename,[(layername,paths)])
+                filenames.append(filename)
+        else:
+            filename = os.path.normpath(os.path.join(directory,basename+'.svg'))
+            write(filename,layer_paths)
+            filenames.append(filename)
+        return filenames
+
     def transform(self,T):     
         geoms = {}
         for key, value in self.geoms.items():
@@ -9,6 +9,8 @@ Please see LICENSE for full license.
 from popupcad.geometry.vertex import ShapeVertex
 
 import numpy
+import random
+import threading
 
 import qt.QtCore as qc
 import qt.QtGui as qg
@@ -23,6 +25,23 @@ class ShapeInvalid(Exception):
 class NotSimple(Exception):
     pass
 
+#ids for vertices that only exist as rows of a coordinate array.  each process starts at a random offset above the range of object ids.
+_next_vertex_id = 2**53 + random.randrange(2**52)
+_vertex_id_lock = threading.Lock()
+
+def allocate_ids(count):
+    global _next_vertex_id
+    with _vertex_id_lock:
+        first = _next_vertex_id
+        _next_vertex_id += count
+    return numpy.arange(first, first + count, dtype=numpy.int64)
+
+def as_positions(positions):
+    positions = numpy.asarray(positions, dtype=numpy.float64)
+    if positions.size == 0:
+        return numpy.zeros((0, 2))
+    return positions
+
 class GenericShapeBase(object):
     display = ['construction', 'exterior', 'interiors']
     editable = ['construction']
@@ -34,6 +53,8 @@ class GenericShapeBase(object):
         rect2point='rect2point')
     deletable = []
 
+    array_attributes = ['_exterior_array', '_interior_arrays', '_exterior_ids', '_interior_ids']
+
     def __init__(self,exterior,interiors,construction=False,test_shapely=False):
         self.id = id(self)
         self.exterior = exterior
@@ -46,6 +67,79 @@ class GenericShapeBase(object):
         self.exterior = self.remove_redundant_points(self.exterior)
         self.interiors = [self.remove_redundant_points(interior) for interior in self.interiors]
 
+    @classmethod
+    def gen_from_arrays(cls, exterior, interiors, construction=False, exterior_ids=None, interior_ids=None, remove_redundant=True):
+        '''
+        build a shape that stores its loops as float64 coordinate arrays with parallel id arrays.
+        ShapeVertex objects are only created if something asks for them through get_exterior or get_interiors.
+        pass remove_redundant=False for loops that have already been through redundant_point_mask.
+        '''
+        new = cls.__new__(cls)
+        new.id = id(new)
+        new.construction = construction
+        loops = [as_positions(exterior)] + [as_positions(interior) for interior in interiors]
+        lengths = [len(loop) for loop in loops]
+        if exterior_ids is None:
+            ids = numpy.split(allocate_ids(sum(lengths)), numpy.cumsum(lengths)[:-1])
+        else:
+            ids = [numpy.asarray(exterior_ids)] + [numpy.asarray(item) for item in interior_ids]
+        if remove_redundant:
+            keep = cls.redundant_point_mask(numpy.concatenate(loops), lengths)
+            keep = numpy.split(keep, numpy.cumsum(lengths)[:-1])
+            for ii, loop_keep in enumerate(keep):
+                if not loop_keep.all():
+                    loops[ii] = loops[ii][loop_keep]
+                    ids[ii] = ids[ii][loop_keep]
+        new._exterior_array = loops[0]
+        new._exterior_ids = ids[0]
+        new._interior_arrays = loops[1:]
+        new._interior_ids = ids[1:]
+        return new
+
+    def is_array_backed(self):
+        return '_exterior_array' in self.__dict__
+
+    @staticmethod
+    def build_vertices(positions, ids):
+        return ShapeVertex.from_positions(positions, ids)
+
+    def materialize_vertices(self):
+        '''replace the coordinate arrays with ShapeVertex objects carrying the same ids'''
+        self.exterior = self.build_vertices(self._exterior_array, self._exterior_ids)
+        self.interiors = [self.build_vertices(positions, ids) for positions, ids in zip(self._interior_arrays, self._interior_ids)]
+        for name in self.array_attributes:
+            delattr(self, name)
+        self.geometry_changed()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_shapely_state', None)
+        if self.is_array_backed():
+            for name in self.array_attributes:
+                del state[name]
+            state['exterior'] = self.build_vertices(self._exterior_array, self._exterior_ids)
+            state['interiors'] = [self.build_vertices(positions, ids) for positions, ids in zip(self._interior_arrays, self._interior_ids)]
+        return state
+
+    def exterior_array(self, scaling=1):
+        '''exterior coordinates as an n x 2 float64 array'''
+        if self.is_array_backed():
+            positions = self._exterior_array
+        else:
+            positions = as_positions([vertex.getpos() for vertex in self.get_exterior()])
+        if scaling != 1:
+            positions = positions * scaling
+        return positions
+
+    def interior_arrays(self, scaling=1):
+        if self.is_array_backed():
+            interiors = self._interior_arrays[:]
+        else:
+            interiors = [as_positions([vertex.getpos() for vertex in interior]) for interior in self.get_interiors()]
+        if scaling != 1:
+            interiors = [interior * scaling for interior in interiors]
+        return interiors
+
     def is_valid_bool(self):
         try: 
             self.is_valid()
@@ -54,12 +148,50 @@ class GenericShapeBase(object):
             return False
             
     def is_valid(self):
-        shapely = self.to_shapely()
-        if not shapely.is_simple:
+        state = self.shapely_state()
+        if 'simple' not in state:
+            state['simple'] = state['geometry'].is_simple
+            state['valid'] = state['geometry'].is_valid
+        if not state['simple']:
             raise(NotSimple)
-        if not shapely.is_valid:
+        if not state['valid']:
             raise(ShapeInvalid)
 
+    def shapely_key(self):
+        '''
+        what the shapely conversion depends on.  vertex objects can be moved from outside the shape(by constraints or dragging),
+        so their positions are part of the key; coordinate arrays only change through methods that call geometry_changed.
+        '''
+        if self.is_array_backed():
+            return popupcad.csg_processing_scaling
+        return popupcad.csg_processing_scaling, tuple([vertex.getpos() for vertex in self.get_exterior()]), tuple([tuple([vertex.getpos() for vertex in interior]) for interior in self.get_interiors()])
+
+    def shapely_state(self):
+        '''the shapely geometry and, once checked, its validity, recomputed only when shapely_key changes'''
+        key = self.shapely_key()
+        try:
+            old_key, state = self._shapely_state
+            if old_key == key:
+                return state
+        except AttributeError:
+            pass
+        state = {'geometry': self.gen_shapely()}
+        self._shapely_state = key, state
+        return state
+
+    def cache_shapely(self, geometry):
+        '''store geometry as the result of gen_shapely, for shapely objects built outside the shape'''
+        self._shapely_state = self.shapely_key(), {'geometry': geometry}
+
+    def geometry_changed(self):
+        try:
+            del self._shapely_state
+        except AttributeError:
+            pass
+
+    def to_shapely(self):
+        return self.shapely_state()['geometry']
+
     @classmethod
     def lastdir(cls):
         return popupcad.lastshapedir
@@ -73,6 +205,13 @@ class GenericShapeBase(object):
         return notempty
 
     def copy_data(self, new_type, identical=True):
+        if self.is_array_backed():
+            if identical:
+                new = new_type.gen_from_arrays(self._exterior_array, self._interior_arrays, self.is_construction(), self._exterior_ids, self._interior_ids)
+                new.id = self.id
+            else:
+                new = new_type.gen_from_arrays(self._exterior_array, self._interior_arrays, self.is_construction())
+            return new
         exterior = [vertex.copy(identical) for vertex in self.get_exterior()]
         interiors = [[vertex.copy(identical) for vertex in interior]
                      for interior in self.get_interiors()]
@@ -85,6 +224,11 @@ class GenericShapeBase(object):
         return self.copy_data(type(self), identical)
 
     def upgrade(self, identical=True):
+        if self.is_array_backed():
+            new = type(self).gen_from_arrays(self._exterior_array, self._interior_arrays, self.is_construction(), self._exterior_ids, self._interior_ids)
+            if identical:
+                new.id = self.id
+            return new
         exterior = [vertex.upgrade(identical) for vertex in self.get_exterior()]
         interiors = [[vertex.upgrade(identical) for vertex in interior] for interior in self.get_interiors()]
         new = type(self)(exterior, interiors, self.is_construction())
@@ -93,10 +237,18 @@ class GenericShapeBase(object):
         return new
 
     def get_exterior(self):
-        return self.exterior
+        try:
+            return self.exterior
+        except AttributeError:
+            self.materialize_vertices()
+            return self.exterior
 
     def get_interiors(self):
-        return self.interiors
+        try:
+            return self.interiors
+        except AttributeError:
+            self.materialize_vertices()
+            return self.interiors
 
     def is_construction(self):
         try:
@@ -109,32 +261,28 @@ class GenericShapeBase(object):
         self.construction = test
 
     def exteriorpoints(self, scaling=1):
+        if self.is_array_backed():
+            return [tuple(point) for point in self.exterior_array(scaling).tolist()]
         return [vertex.getpos(scaling) for vertex in self.get_exterior()]
 
     def interiorpoints(self, scaling=1):
+        if self.is_array_backed():
+            return [[tuple(point) for point in interior.tolist()] for interior in self.interior_arrays(scaling)]
         return [[vertex.getpos(scaling) for vertex in interior]
                 for interior in self.get_interiors()]
 
-    def exteriorpoints_3d(self, z=0):
-        points = numpy.array([vertex.getpos() for vertex in self.get_exterior()])
-        size = list(points.shape)
-        size[1]+=1
-        points2 = numpy.zeros(size)        
-        points2[:,:2] = points
+    @staticmethod
+    def points_3d(points, z):
+        points2 = numpy.zeros((len(points), 3))
+        points2[:,:2] = points[:,:2]
         points2[:,2] = z
-        return points2.tolist()
+        return points2
+
+    def exteriorpoints_3d(self, z=0):
+        return self.points_3d(self.exterior_array(), z).tolist()
         
     def interiorpoints_3d(self, z=0):
-        interiors2 = []
-        for interior in self.get_interiors():
-            points = numpy.array([vertex.getpos() for vertex in interior])
-            size = list(points.shape)
-            size[1]+=1
-            points2 = numpy.zeros(size)        
-            points2[:,:2] = points
-            points2[:,2] = z
-            interiors2.append(points2.tolist())            
-        return interiors2
+        return [self.points_3d(interior, z).tolist() for interior in self.interior_arrays()]
 
     def vertices(self):
         vertices = self.get_exterior()[:]
@@ -142,6 +290,10 @@ class GenericShapeBase(object):
         return vertices
 
     def points(self, scaling=1):
+        if self.is_array_backed():
+            points = self.exteriorpoints(scaling)
+            [points.extend(interior) for interior in self.interiorpoints(scaling)]
+            return points
         return [vertex.getpos(scaling) for vertex in self.vertices()]
 
     def segments_closed(self):
@@ -180,7 +332,8 @@ class GenericShapeBase(object):
         return PropertyEditor(self)
 
     def addvertex_exterior(self, vertex, special=False):
-        self.exterior.append(vertex)
+        self.geometry_changed()
+        self.get_exterior().append(vertex)
         self.update_handles()
 
     def addvertex_exterior_special(self, vertex, special=False):
@@ -201,11 +354,12 @@ class GenericShapeBase(object):
         self.update_handles()
 
     def removevertex(self, vertex):
-        if vertex in self.exterior:
+        self.geometry_changed()
+        if vertex in self.get_exterior():
             ii = self.exterior.index(vertex)
             self.exterior.pop(ii)
-        for interior in self.interiors:
-            if vertex in self.interior:
+        for interior in self.get_interiors():
+            if vertex in interior:
                 ii = interior.index(vertex)
                 interior.pop(ii)
         self.update_handles()
@@ -219,29 +373,24 @@ class GenericShapeBase(object):
     @staticmethod
     def _condition_loop(loop,round_vertices = False, test_rounded_vertices = True, remove_forward_redundancy=True, remove_loop_reduncancy=True,terminate_with_start = False,decimal_places = None):
         if len(loop)>0:
+            #equality of rounded or exact positions is transitive, so comparing each vertex with the previous one
+            #gives the same result as comparing it with the last vertex kept
+            positions = as_positions([vertex.getpos() for vertex in loop])
+            if test_rounded_vertices:
+                if decimal_places is None:
+                    positions = positions.round(popupcad.geometry_round_value)
+                else:
+                    positions = positions.round(decimal_places)
+
             if remove_forward_redundancy:
-                new_loop = [loop.pop(0)]
-                while not not loop:
-                    v1 = new_loop[-1]
-                    v2 = loop.pop(0)
-                    
-                    if test_rounded_vertices:
-                        equal = v1.rounded_is_equal(v2,decimal_places)
-                    else:
-                        equal = v1.identical(v2)
-                    
-                    if not equal:
-                        new_loop.append(v2)
+                keep = numpy.r_[True, (positions[1:] != positions[:-1]).any(1)]
+                new_loop = [vertex for vertex, kept in zip(loop, keep) if kept]
+                positions = positions[keep]
             else:
                 new_loop = loop[:]
             
             v1 = new_loop[0]
-            v2 = new_loop[-1]
-            
-            if test_rounded_vertices:
-                equal = v1.rounded_is_equal(v2,decimal_places)
-            else:
-                equal = v1.identical(v2)
+            equal = bool((positions[0] == positions[-1]).all())
             
             if terminate_with_start:
                 if not equal:
@@ -258,8 +407,9 @@ class GenericShapeBase(object):
             return loop
 
     def _condition(self,round_vertices = False, test_rounded_vertices = True, remove_forward_redundancy=True, remove_loop_reduncancy=True,terminate_with_start = False,decimal_places = None):
-        self.exterior = self._condition_loop(self.exterior,round_vertices = False, test_rounded_vertices = True, remove_forward_redundancy=True, remove_loop_reduncancy=True,terminate_with_start = False,decimal_places = None)
-        self.interiors = [self._condition_loop(interior,round_vertices = False, test_rounded_vertices = True, remove_forward_redundancy=True, remove_loop_reduncancy=True,terminate_with_start = False,decimal_places = None) for interior in self.interiors]
+        self.geometry_changed()
+        self.exterior = self._condition_loop(self.get_exterior(),round_vertices = False, test_rounded_vertices = True, remove_forward_redundancy=True, remove_loop_reduncancy=True,terminate_with_start = False,decimal_places = None)
+        self.interiors = [self._condition_loop(interior,round_vertices = False, test_rounded_vertices = True, remove_forward_redundancy=True, remove_loop_reduncancy=True,terminate_with_start = False,decimal_places = None) for interior in self.get_interiors()]
 
     @classmethod    
     def condition_loop(cls,loop):
@@ -272,8 +422,8 @@ class GenericShapeBase(object):
     @classmethod
     def gen_from_point_lists(cls, exterior_p, interiors_p, **kwargs):
 
-        exterior = [ShapeVertex(point) for point in exterior_p]
-        interiors= [[ShapeVertex(point) for point in interior] for interior in interiors_p]
+        exterior = ShapeVertex.from_positions(exterior_p)
+        interiors= [ShapeVertex.from_positions(interior) for interior in interiors_p]
 
         return cls(exterior, interiors, **kwargs)
 
@@ -301,6 +451,8 @@ class GenericShapeBase(object):
         self._handles = handles
 
     def len_exterior(self):
+        if self.is_array_backed():
+            return len(self._exterior_array)
         return len(self.get_exterior())
 
     def get_handles(self):
@@ -326,40 +478,53 @@ class GenericShapeBase(object):
                              for point in numpy.array(points)])
         return poly
 
+    @staticmethod
+    def loops_equal(loop1, loop2):
+        if len(loop1) != len(loop2):
+            return False
+        if len(loop1) == 0:
+            return True
+        distances = (((loop2 - loop1)**2).sum(1))**.5
+        return bool((distances < popupcad.distinguishable_number_difference).all())
+
     def is_equal(self, other):
         if isinstance(self, type(other)):
-            if len(
-                self.get_exterior()) == len(
-                other.get_exterior()) and len(
-                self.get_interiors()) == len(
-                    other.get_interiors()):
-                for point1, point2 in zip(
-                        self.get_exterior(), other.get_exterior()):
-                    if not point1.is_equal(point2, popupcad.distinguishable_number_difference):
-                        return False
-                for interior1, interior2 in zip(
-                        self.get_interiors(), other.get_interiors()):
-                    if len(interior1) != len(interior2):
-                        return False
-                    for point1, point2 in zip(interior1, interior2):
-                        if not point1.is_equal(point2, popupcad.distinguishable_number_difference):
-                            return False
-                return True
+            interiors1 = self.interior_arrays()
+            interiors2 = other.interior_arrays()
+            if len(interiors1) != len(interiors2):
+                return False
+            if not self.loops_equal(self.exterior_array(), other.exterior_array()):
+                return False
+            for interior1, interior2 in zip(interiors1, interiors2):
+                if not self.loops_equal(interior1, interior2):
+                    return False
+            return True
         return False
 
     def scale(self, m):
+        self.geometry_changed()
+        if self.is_array_backed():
+            self._exterior_array = self._exterior_array * m
+            self._interior_arrays = [interior * m for interior in self._interior_arrays]
+            return
         [item.scale(m) for item in self.get_exterior()]
         [item.scale(m) for interior in self.get_interiors() for item in interior]
 
     def shift(self, dxdy):
+        self.geometry_changed()
+        if self.is_array_backed():
+            dxdy = numpy.array(dxdy)
+            self._exterior_array = self._exterior_array + dxdy
+            self._interior_arrays = [interior + dxdy for interior in self._interior_arrays]
+            return
         [item.shift(dxdy) for item in self.get_exterior()]
         [item.shift(dxdy) for interior in self.get_interiors()
          for item in interior]
 
     def transform(self, T):
-        exteriorpoints = (T.dot(numpy.array(self.exteriorpoints_3d(z=1)).T)).T[:,:2].tolist()
-        interiorpoints = [(T.dot(numpy.array(interior).T)).T[:,:2].tolist() for interior in self.interiorpoints_3d(z=1)]
-        return self.gen_from_point_lists(exteriorpoints,interiorpoints)
+        exterior = (T.dot(self.points_3d(self.exterior_array(), 1).T)).T[:,:2]
+        interiors = [(T.dot(self.points_3d(interior, 1).T)).T[:,:2] for interior in self.interior_arrays()]
+        return self.gen_from_arrays(exterior, interiors)
 
     def constrained_shift(self, dxdy, constraintsystem):
         a = [(item, dxdy) for item in self.get_exterior()]
@@ -367,6 +532,13 @@ class GenericShapeBase(object):
         constraintsystem.constrained_shift(a)
 
     def flip(self):
+        self.geometry_changed()
+        if self.is_array_backed():
+            self._exterior_array = self._exterior_array[::-1]
+            self._exterior_ids = self._exterior_ids[::-1]
+            self._interior_arrays = [interior[::-1] for interior in self._interior_arrays]
+            self._interior_ids = [ids[::-1] for ids in self._interior_ids]
+            return
         self.exterior = self.get_exterior()[::-1]
         self.interiors = [interior[::-1] for interior in self.get_interiors()]
 
@@ -377,10 +549,12 @@ class GenericShapeBase(object):
         return [self]
 
     def insert_exterior_vertex(self, ii, vertex):
-        self.exterior.insert(ii, vertex)
+        self.geometry_changed()
+        self.get_exterior().insert(ii, vertex)
 
     def append_exterior_vertex(self, vertex):
-        self.exterior.append(vertex)
+        self.geometry_changed()
+        self.get_exterior().append(vertex)
 
     def output_dxf(self,model_space,layer = None):
         csg = self.to_shapely()
@@ -413,18 +587,61 @@ class GenericShapeBase(object):
         return list(zip(x_values, y_values))
 
 
+    @staticmethod
+    def redundant_point_mask_sequential(positions, loop_test = True):
+        tolerance = popupcad.distinguishable_number_difference
+        points = positions.tolist()
+        keep = numpy.zeros(len(points), dtype=bool)
+        if len(points) == 0:
+            return keep
+
+        def distinct(point1, point2):
+            return sum([(a - b)**2 for a, b in zip(point1, point2)])**.5 >= tolerance
+
+        keep[0] = True
+        last = points[0]
+        for ii in range(1, len(points)):
+            if distinct(last, points[ii]):
+                if ii == len(points) - 1 and loop_test:
+                    keep[ii] = distinct(points[0], points[ii])
+                else:
+                    keep[ii] = True
+                    last = points[ii]
+        return keep
+
+    @classmethod
+    def redundant_point_mask(cls, positions, lengths, loop_test = True):
+        '''
+        which rows of positions, a concatenation of loops with the given lengths, remove_redundant_points would keep.
+        loops with no step shorter than the tolerance are handled with array operations, the rest point by point.
+        '''
+        tolerance = popupcad.distinguishable_number_difference
+        keep = numpy.ones(len(positions), dtype=bool)
+        if len(positions) == 0:
+            return keep
+        lengths = numpy.asarray(lengths, dtype=int)
+        ends = numpy.cumsum(lengths)
+        starts = ends - lengths
+        steps = (((positions[1:] - positions[:-1])**2).sum(1))**.5
+        short = numpy.r_[False, steps < tolerance]
+        short[starts[lengths > 0]] = False
+        short_sums = numpy.r_[0, numpy.cumsum(short)]
+        short_counts = short_sums[ends] - short_sums[starts]
+        for start, end in zip(starts[short_counts > 0], ends[short_counts > 0]):
+            keep[start:end] = cls.redundant_point_mask_sequential(positions[start:end], loop_test)
+        if loop_test:
+            closed = (short_counts == 0) & (lengths >= 2)
+            firsts = starts[closed]
+            lasts = ends[closed] - 1
+            closing = (((positions[lasts] - positions[firsts])**2).sum(1))**.5
+            keep[lasts[closing < tolerance]] = False
+        return keep
+
     @classmethod
     def remove_redundant_points(cls, points, scaling=1,loop_test = True):
-        newpoints = []
-        if len(points)>0:
-            points = points[:]
-            newpoints.append(points.pop(0))
-            while not not points:
-                newpoint = points.pop(0)
-                if not popupcad.algorithms.points.twopointsthesame(newpoints[-1].getpos(scaling),newpoint.getpos(scaling),popupcad.distinguishable_number_difference):
-                    if len(points)==0 and loop_test:
-                        if not popupcad.algorithms.points.twopointsthesame(newpoints[0].getpos(scaling),newpoint.getpos(scaling),popupcad.distinguishable_number_difference):
-                            newpoints.append(newpoint)
-                    else:
-                        newpoints.append(newpoint)
-        return newpoints
\ No newline at end of file
+        '''drop vertices that coincide with the last vertex kept, and for loops a final vertex that coincides with the first'''
+        if len(points) == 0:
+            return []
+        positions = as_positions([point.getpos(scaling) for point in points])
+        keep = GenericShapeBase.redundant_point_mask(positions, [len(points)], loop_test)
+        return [point for point, kept in zip(points, keep) if kept]
\ No newline at end of file
@@ -41,7 +41,7 @@ class GenericLine(GenericShapeBase):
         path.addPolygon(self.generateQPolygon(exterior))
         return path
 
-    def to_shapely(self):
+    def gen_shapely(self):
         exterior_p = self.exteriorpoints(scaling = popupcad.csg_processing_scaling)
         obj = sg.LineString(exterior_p)
         return obj
@@ -62,6 +62,9 @@ class GenericPolyline(GenericShapeBase):
     @classmethod
     def remove_redundant_points(cls, points, scaling=1):
         return GenericShapeBase.remove_redundant_points(points,scaling,loop_test = False)
+    @classmethod
+    def redundant_point_mask(cls, positions, lengths):
+        return GenericShapeBase.redundant_point_mask(positions,lengths,loop_test = False)
 
     def outputinteractive(self):
         from popupcad.graphics2d.interactive import InteractivePath
@@ -76,7 +79,7 @@ class GenericPolyline(GenericShapeBase):
         path.addPolygon(self.generateQPolygon(exterior))
         return path
 
-    def to_shapely(self):
+    def gen_shapely(self):
         exterior_p = self.exteriorpoints(scaling = popupcad.csg_processing_scaling)
         try:
             obj = sg.LineString(exterior_p)
@@ -150,7 +153,7 @@ class GenericPoly(GenericShapeBase):
         tris = (numpy.array(tris)/popupcad.triangulation_scaling).tolist()
         return tris
 
-    def to_shapely(self):
+    def gen_shapely(self):
         exterior_p = self.exteriorpoints(scaling = popupcad.csg_processing_scaling)
         interiors_p = self.interiorpoints(scaling = popupcad.csg_processing_scaling)
         obj = sg.Polygon(exterior_p, interiors_p)
@@ -289,7 +292,7 @@ class GenericCircle(GenericShapeBase):
         path.addEllipse(rect)
         return path
 
-    def to_shapely(self):
+    def gen_shapely(self):
         exterior_p = self.exteriorpoints(scaling = popupcad.csg_processing_scaling)
         exterior = numpy.array(exterior_p)
         center = exterior[0]
@@ -323,7 +326,7 @@ class GenericTwoPointRect(GenericShapeBase):
         path.addRect(rect)
         return path
 
-    def to_shapely(self):
+    def gen_shapely(self):
         exterior_p = self.exteriorpoints(scaling = popupcad.csg_processing_scaling)
         corner1 = exterior_p[0]
         corner2 = (exterior_p[0][0], exterior_p[1][1])
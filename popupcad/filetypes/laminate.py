@@ -6,6 +6,58 @@ Please see LICENSE for full license.
 """
 from popupcad.filetypes.layer import Layer
 import popupcad
+import concurrent.futures
+import threading
+
+_layer_pool = None
+_layer_pool_threads = 0
+_in_layer_pool = threading.local()
+
+def _run_in_pool(function, item):
+    _in_layer_pool.active = True
+    try:
+        return function(item)
+    finally:
+        _in_layer_pool.active = False
+
+def map_layers(function, layers):
+    '''
+    apply function to each layer, on a shared thread pool when popupcad.csg_threads is greater than one.
+    geos releases the gil, so independent layers are processed concurrently.
+    calls made from inside the pool run serially rather than waiting on the pool they occupy.
+    '''
+    global _layer_pool, _layer_pool_threads
+    threads = popupcad.csg_threads
+    if threads <= 1 or len(layers) <= 1 or getattr(_in_layer_pool, 'active', False):
+        return [function(layer) for layer in layers]
+    if _layer_pool is None or _layer_pool_threads != threads:
+        if _layer_pool is not None:
+            _layer_pool.shutdown(wait=False)
+        _layer_pool = concurrent.futures.ThreadPoolExecutor(threads)
+        _layer_pool_threads = threads
+    return list(_layer_pool.map(lambda layer: _run_in_pool(function, layer), layers))
+
+def map_shared(function, items, keys):
+    '''
+    apply function to each item through map_layers, evaluating it once per distinct key.
+    items with equal keys share the result, as shallow copies so that each layer keeps its own Layer object.
+    '''
+    first = {}
+    distinct = []
+    for item, key in zip(items, keys):
+        if key not in first:
+            first[key] = len(distinct)
+            distinct.append(item)
+    results = map_layers(function, distinct)
+    used = set()
+    resultsout = []
+    for key in keys:
+        result = results[first[key]]
+        if key in used:
+            result = result.shallow_copy()
+        used.add(key)
+        resultsout.append(result)
+    return resultsout
 
 
 class IterableLaminate(object):
@@ -53,6 +105,12 @@ class Laminate(IterableLaminate):
     def copy(self):
         new = type(self)(self.layerdef)
         new.layer_sequence = self.layer_sequence.copy()
+        return new
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_cumulative_unions', None)
+        return state
 
     def upgrade(self, *args, **kwargs):
         return self
@@ -87,71 +145,105 @@ class Laminate(IterableLaminate):
     def buffer(self, value, **kwargs):
         if not 'resolution' in kwargs:
             kwargs['resolution'] = popupcad.default_buffer_resolution
-        return self.valueoperation('buffer', value, **kwargs)
+        return self.map_layer_sequence(lambda layer: layer.buffer(value, **kwargs))
 
     def cleanup(self, value):
-        return popupcad.algorithms.morphology.cleanup(self,value,resolution=1)
+        return self.map_layer_sequence(lambda layer: popupcad.algorithms.morphology.cleanup(layer,value,resolution=1))
+
+    def map_layer_sequence(self, function):
+        '''a new laminate made by applying function to each of this laminate's Layer objects'''
+        lsout = Laminate(self.layerdef)
+        layers = self.layerdef.layers
+        items = [self.layer_sequence[layer] for layer in layers]
+        results = map_shared(function, items, [item.geometry_key() for item in items])
+        for layer, result in zip(layers, results):
+            lsout.layer_sequence[layer] = result
+        return lsout
+
+    def cumulative_unions(self):
+        '''
+        running unions of the layers in both directions, as two laminates (up, down):
+        layer i of up is the union of layers 0..i, and layer i of down the union of layers i..n-1.
+        the scans are computed together and kept until a layer of this laminate is replaced or changed.
+        '''
+        layers = self.layerdef.layers
+        state = [(self.layer_sequence[layer], self.layer_sequence[layer].geoms) for layer in layers]
+        try:
+            old_state, result = self._cumulative_unions
+            if len(old_state) == len(state) and all([item1 is item2 and geoms1 is geoms2 for (item1, geoms1), (item2, geoms2) in zip(old_state, state)]):
+                return result
+        except AttributeError:
+            pass
+
+        def scan(order):
+            current = Layer([])
+            running = []
+            for layer in order:
+                current = current.union(self.layer_sequence[layer])
+                running.append(current)
+            return running
+
+        up_layers, down_layers = map_layers(scan, [layers, layers[::-1]])
+        up = Laminate(self.layerdef)
+        down = Laminate(self.layerdef)
+        for layer, item in zip(layers, up_layers):
+            up.layer_sequence[layer] = item
+        for layer, item in zip(layers[::-1], down_layers):
+            down.layer_sequence[layer] = item
+        self._cumulative_unions = state, (up, down)
+        return up, down
 
     def simplify(self, tolerance, **kwargs):
         return self.valueoperation('simplify',tolerance,preserve_topology=True)
 
     def binaryoperation(self, ls2, function):
-        self = self
         lsout = Laminate(self.layerdef)
         layers = self.layerdef.layers
         if self.layerdef != ls2.layerdef:
             raise Exception
-        for layer in layers:
-            layer1 = self.layer_sequence[layer]
-            layer2 = ls2.layer_sequence[layer]
-            layerout = layer1.binaryoperation(layer2, function)
-            lsout.replacelayergeoms(layer, layerout.geoms)
+        items = [(self.layer_sequence[layer], ls2.layer_sequence[layer]) for layer in layers]
+        keys = [(item1.geometry_key(), item2.geometry_key()) for item1, item2 in items]
+        results = map_shared(lambda item: item[0].binaryoperation(item[1], function), items, keys)
+        for layer, layerout in zip(layers, results):
+            lsout.layer_sequence[layer] = layerout
         return lsout
 
     @staticmethod
     def unaryoperation(laminates, function):
-        laminates = laminates[:]
-        lsout = laminates.pop(0)
-        while not not laminates:
-            lsout = lsout.binaryoperation(laminates.pop(0), function)
+        lsout = laminates[0]
+        if len(laminates) == 1:
+            return lsout
+        for item in laminates[1:]:
+            if item.layerdef != lsout.layerdef:
+                raise Exception
+        lsout = Laminate(lsout.layerdef)
+        layers = lsout.layerdef.layers
+        items = [[item.layer_sequence[layer] for item in laminates] for layer in layers]
+        keys = [tuple([item.geometry_key() for item in layer_items]) for layer_items in items]
+        results = map_shared(lambda layer_items: Layer.unaryoperation(layer_items, function), items, keys)
+        for layer, layerout in zip(layers, results):
+            lsout.layer_sequence[layer] = layerout
         return lsout
 
     def valueoperation(self, functionname, value, **kwargs):
-        lsout = Laminate(self.layerdef)
-        layers = self.layerdef.layers
-        for layer in layers:
-            layer1 = self.layer_sequence[layer]
-            result = layer1.valueoperation(functionname, value, **kwargs)
-            lsout.replacelayergeoms(layer, result.geoms)
-        return lsout
+        return self.map_layer_sequence(lambda layer: layer.valueoperation(functionname, value, **kwargs))
 
     def unarylayeroperation(
             self,
             functionname,
             selectedinputlayers,
             selectedoutputlayers):
-        selectedinputlayers = selectedinputlayers[:]
-        layer1 = self.layer_sequence[selectedinputlayers.pop(0)]
-        for layer in selectedinputlayers:
-            layer2 = self.layer_sequence[layer]
-            layer1 = layer1.binaryoperation(layer2, functionname)
-        result = popupcad.algorithms.csg_shapely.unary_union_safe(layer1.geoms)
-        geoms1 = popupcad.algorithms.csg_shapely.condition_shapely_entities(result)
+        layers = [self.layer_sequence[layer] for layer in selectedinputlayers]
+        layer1 = Layer.unaryoperation(layers, functionname)
+        geoms1 = popupcad.algorithms.csg_shapely.condition_shapely_entities(layer1.dissolved())
         lsout = Laminate(self.layerdef)
         for layer in selectedoutputlayers:
             lsout.replacelayergeoms(layer, geoms1)
         return lsout
 
     def binarylayeroperation2(self, function, layers1, layers2, outputlayers):
-        layer1 = self.layer_sequence[layers1.pop(0)]
-        for layer in layers1:
-            layer2 = self.layer_sequence[layer]
-            layer1 = layer1.union(layer2)
-        layer3 = self.layer_sequence[layers2.pop(0)]
-
-        for layer in layers2:
-            layer2 = self.layer_sequence[layer]
-            layer3 = layer3.union(layer2)
+        layer1 = Layer.unaryoperation([self.layer_sequence[layer] for layer in layers1], 'union')
+        layer3 = Layer.unaryoperation([self.layer_sequence[layer] for layer in layers2], 'union')
         layerout = layer1.binaryoperation(layer3, function)
 
         lsout = Laminate(self.layerdef)
@@ -167,10 +259,7 @@ class Laminate(IterableLaminate):
         genericgeometry = {}
         for layer in self.layerdef.layers:
             geometry = self.layer_sequence[layer].geoms
-            genericgeoms = []
-            for geom in geometry:
-                genericgeoms.append(popupcad.algorithms.csg_shapely.to_generic(geom))
-            genericgeometry[layer] = genericgeoms
+            genericgeometry[layer] = popupcad.algorithms.csg_shapely.to_generic_all(geometry)
         new = GenericLaminate(self.layerdef, genericgeometry)
         return new
 
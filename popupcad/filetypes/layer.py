@@ -28,10 +28,62 @@ class Layer(object):
     def buffer(self, value, **kwargs):
         if not 'resolution' in kwargs:
             kwargs['resolution'] = popupcad.default_buffer_resolution
-        return self.valueoperation('buffer', value, **kwargs)
+        return popupcad.algorithms.buffer_cache.buffer(self, value, **kwargs)
 
     def add_geoms(self, geoms):
-        self.geoms.extend(geoms)
+        self.geoms = self.geoms + list(geoms)
+        self.geometry_changed()
+
+    def geometry_changed(self):
+        for name in ['_dissolved', '_components', '_fingerprint']:
+            try:
+                delattr(self, name)
+            except AttributeError:
+                pass
+
+    def geometry_key(self):
+        '''identity of the geometry objects in the layer. layers built from the same objects have equal keys'''
+        return tuple([id(geom) for geom in self.geoms])
+
+    def fingerprint(self):
+        '''content hash of the layer's geometry'''
+        try:
+            return self._fingerprint
+        except AttributeError:
+            self._fingerprint = popupcad.algorithms.content_hash.hash_layer(self)
+            return self._fingerprint
+
+    def dissolved(self):
+        '''the union of the layer's geometry as a single shapely object, computed once and reused by every operation on the layer'''
+        try:
+            return self._dissolved
+        except AttributeError:
+            if self.geoms == []:
+                self._dissolved = sg.Polygon()
+            else:
+                self._dissolved = popupcad.algorithms.csg_shapely.unary_union_safe(self.geoms)
+            return self._dissolved
+
+    def components(self):
+        '''the separate pieces of the dissolved geometry, which do not overlap one another'''
+        try:
+            return self._components
+        except AttributeError:
+            self._components = popupcad.algorithms.csg_shapely.condition_shapely_entities(self.dissolved())
+            return self._components
+
+    @classmethod
+    def from_dissolved(cls, geom):
+        '''split an already dissolved geometry into the layer's entities, keeping the dissolved form'''
+        new = cls.from_components(popupcad.algorithms.csg_shapely.condition_shapely_entities(geom))
+        new._dissolved = geom
+        return new
+
+    @classmethod
+    def from_components(cls, geoms):
+        new = cls(geoms)
+        new._components = geoms
+        return new
 
     def promote(self, layerdef):
         from popupcad.filetypes.laminate import Laminate
@@ -44,43 +96,110 @@ class Layer(object):
     def unary_union(cls, layers):
         geoms = [geom for layer in layers for geom in layer.geoms]
         result1 = popupcad.algorithms.csg_shapely.unary_union_safe(geoms)
-        result2 = popupcad.algorithms.csg_shapely.condition_shapely_entities(result1)
-        return cls(result2)
+        return cls.from_dissolved(result1)
 
-    def binaryoperation(self, layer2, functionname):
-        sourcegeoms = self.geoms
-        operationgeoms = layer2.geoms
-
-        if sourcegeoms == []:
-            sourcegeom = sg.Polygon()
-        else:
-            sourcegeom = popupcad.algorithms.csg_shapely.unary_union_safe(sourcegeoms)
+    @classmethod
+    def unary_intersection(cls, layers):
+        '''intersect the smallest layers first, stopping as soon as the result is empty'''
+        geoms = sorted([layer.dissolved() for layer in layers], key=lambda geom: geom.area)
+        result = geoms.pop(0)
+        for geom in geoms:
+            if result.is_empty:
+                break
+            result = popupcad.algorithms.csg_shapely.overlay(result, 'intersection', geom)
+        result1 = popupcad.algorithms.csg_shapely.unary_union_safe([result])
+        return cls.from_dissolved(result1)
 
-        if operationgeoms == []:
-            operationgeom = sg.Polygon()
+    @classmethod
+    def unaryoperation(cls, layers, functionname):
+        '''combine any number of layers in one reduction rather than a chain of pairwise operations'''
+        if len(layers) == 1:
+            return layers[0]
+        if functionname == 'union':
+            return cls.unary_union(layers)
+        elif functionname == 'intersection':
+            return cls.unary_intersection(layers)
+        elif functionname == 'difference':
+            return layers[0].difference(cls.unary_union(layers[1:]))
         else:
-            operationgeom = popupcad.algorithms.csg_shapely.unary_union_safe(operationgeoms)
+            result = layers[0]
+            for layer in layers[1:]:
+                result = result.binaryoperation(layer, functionname)
+            return result
 
-        function = getattr(sourcegeom, functionname)
-        newgeom = function(operationgeom)
+    def binaryoperation(self, layer2, functionname):
+        '''
+        only pieces whose envelopes overlap a piece of the other operand are passed to geos.
+        the rest are kept or dropped as the operation dictates.
+        kept pieces are snapped to the precision grid like the overlay result.
+        lines and points are noded against each other by the full operation, so layers containing them are not filtered.
+        '''
+        if functionname not in self.envelope_filtered:
+            return self.binaryoperation_full(layer2, functionname)
+
+        components1 = self.components()
+        components2 = layer2.components()
+        if not (popupcad.algorithms.csg_shapely.all_polygons(components1) and popupcad.algorithms.csg_shapely.all_polygons(components2)):
+            return self.binaryoperation_full(layer2, functionname)
+        overlaps1, overlaps2 = popupcad.algorithms.csg_shapely.envelope_overlaps(components1, components2)
+
+        if not any(overlaps1) and popupcad.algorithms.csg_shapely.grid_size() is None:
+            if functionname == 'difference':
+                return type(self).from_components(components1)
+            elif functionname == 'intersection':
+                return type(self).from_components([])
+            elif len(components2) == 0:
+                return type(self).from_components(components1)
+            elif len(components1) == 0:
+                return type(self).from_components(components2)
+
+        unchanged = []
+        if functionname != 'intersection':
+            unchanged.extend([item for item, overlaps in zip(components1, overlaps1) if not overlaps])
+        if functionname in ['union', 'symmetric_difference']:
+            unchanged.extend([item for item, overlaps in zip(components2, overlaps2) if not overlaps])
+        unchanged = popupcad.algorithms.csg_shapely.snap_to_grid(unchanged)
+
+        changed = []
+        if any(overlaps1):
+            sourcegeom = popupcad.algorithms.csg_shapely.unary_union_safe([item for item, overlaps in zip(components1, overlaps1) if overlaps])
+            operationgeom = popupcad.algorithms.csg_shapely.unary_union_safe([item for item, overlaps in zip(components2, overlaps2) if overlaps])
+            newgeom = popupcad.algorithms.csg_shapely.overlay(sourcegeom, functionname, operationgeom)
+            result1 = popupcad.algorithms.csg_shapely.unary_union_safe([newgeom])
+            changed = popupcad.algorithms.csg_shapely.condition_shapely_entities(result1)
+        return type(self).from_components(unchanged + changed)
+
+    envelope_filtered = ['union', 'difference', 'intersection', 'symmetric_difference']
+
+    def binaryoperation_full(self, layer2, functionname):
+        sourcegeom = self.dissolved()
+        operationgeom = layer2.dissolved()
+
+        newgeom = popupcad.algorithms.csg_shapely.overlay(sourcegeom, functionname, operationgeom)
 
         result1 = popupcad.algorithms.csg_shapely.unary_union_safe([newgeom])
-        result2 = popupcad.algorithms.csg_shapely.condition_shapely_entities(result1)
-        return type(self)(result2)
+        return type(self).from_dissolved(result1)
 
-    def valueoperation(self, functionname, *args, **kwargs):
-        sourcegeoms = self.geoms
+    def shallow_copy(self):
+        '''a new layer with the same geometry and cached results'''
+        new = type(self)(self.geoms)
+        new.__dict__.update(self.__dict__)
+        return new
 
-        if sourcegeoms == []:
+    def valueoperation(self, functionname, *args, **kwargs):
+        '''
+        the entities are dissolved again rather than reusing dissolved(): functions like simplify and buffer
+        depend on where each ring starts, which differs between a cached overlay result and a fresh union.
+        '''
+        if self.geoms == []:
             sourcegeom = sg.Polygon()
         else:
-            sourcegeom = popupcad.algorithms.csg_shapely.unary_union_safe(sourcegeoms)
+            sourcegeom = popupcad.algorithms.csg_shapely.unary_union_safe(self.geoms)
 
         function = getattr(sourcegeom, functionname)
         newgeom = function(*args, **kwargs)
         result1 = popupcad.algorithms.csg_shapely.unary_union_safe([newgeom])
-        result2 = popupcad.algorithms.csg_shapely.condition_shapely_entities(result1)
-        return type(self)(result2)
+        return type(self).from_dissolved(result1)
 
     def isEmpty(self):
         return len(self.geoms) == 0
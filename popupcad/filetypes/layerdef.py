@@ -38,8 +38,19 @@ class LayerDef(object):
         return string
 
     def getlayer(self, ref):
-        dict1 = dict([(item.id, item) for item in self.layers])
-        return dict1[ref]
+        try:
+            ii, layer = self._layer_index[ref]
+            if self.layers[ii] is layer:
+                return layer
+        except (AttributeError, KeyError, IndexError):
+            pass
+        self._layer_index = dict([(item.id, (ii, item)) for ii, item in enumerate(self.layers)])
+        return self._layer_index[ref][1]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_layer_index', None)
+        return state
 
     def getlayer_ii(self, ref):
         layer = self.getlayer(ref)
@@ -8,10 +8,13 @@ Please see LICENSE for full license.
 from dev_tools.acyclicdirectedgraph import Node
 from popupcad.filetypes.userdata import UserData
 from popupcad.filetypes.operationoutput import OperationOutput
+import popupcad.algorithms.content_hash as content_hash
+import yaml
 
 
 class Operation2(Node, UserData):
     name = 'Operation'
+    parallel_safe = True
 
     def __init__(self):
         Node.__init__(self)
@@ -36,6 +39,78 @@ class Operation2(Node, UserData):
             del self.output
         except AttributeError:
             pass
+        try:
+            del self._regen_key
+        except AttributeError:
+            pass
+        self.references_changed()
+
+    def references_changed(self):
+        try:
+            self.design.operation_changed(self)
+        except AttributeError:
+            pass
+
+    def get_regen_key(self):
+        try:
+            return self._regen_key
+        except AttributeError:
+            self._regen_key = None
+            return self._regen_key
+    def set_regen_key(self,value):
+        self._regen_key = value
+    regen_key = property(get_regen_key,set_regen_key)
+
+    def get_dirty(self):
+        try:
+            return self._dirty
+        except AttributeError:
+            self._dirty = False
+            return self._dirty
+    def set_dirty(self,value):
+        self._dirty = value
+    dirty = property(get_dirty,set_dirty)
+
+    def has_output(self):
+        return hasattr(self,'output')
+
+    def parameter_key(self):
+        '''hash of the operation's own parameters, taken from the same copy that gets saved to disk'''
+        return content_hash.hash_yaml(self.copy())
+
+    def content_key(self, design):
+        '''
+        key identifying everything the output depends on: the operation's parameters,
+        the layer definition, referenced sketches and subdesigns, and the keys of the parents.
+        returns None when any of these cannot be determined.
+        '''
+        try:
+            parameter_key = self.parameter_key()
+        except (TypeError, AttributeError, yaml.YAMLError):
+            return None
+        if parameter_key is None:
+            return None
+
+        parent_keys = []
+        for ref in self.parentrefs():
+            parent_key = design.op_from_ref(ref).regen_key
+            if parent_key is None:
+                return None
+            parent_keys.append(parent_key)
+
+        try:
+            sketch_keys = [design.content_key(design.sketches[ref]) for ref in self.sketchrefs()]
+            subdesign_keys = [design.content_key(design.subdesigns[ref]) for ref in self.subdesignrefs()]
+        except KeyError:
+            return None
+        layerdef_key = design.content_key(design.return_layer_definition())
+
+        return content_hash.hash_strings(
+            parameter_key,
+            layerdef_key,
+            content_hash.hash_strings(*sketch_keys),
+            content_hash.hash_strings(*subdesign_keys),
+            content_hash.hash_strings(*parent_keys))
 
     def parentrefs(self):
         a = []
@@ -44,6 +119,12 @@ class Operation2(Node, UserData):
             a.extend(b)
         return a
 
+    def outputrefs(self):
+        a = []
+        for key, values in self.operation_links.items():
+            a.extend(values)
+        return a
+
     def subdesignrefs(self):
         a = []
         for key, values in self.design_links.items():
@@ -115,6 +196,7 @@ class Operation2(Node, UserData):
         dialog = self.buildeditdialog(design)
         if dialog.exec_() == dialog.Accepted:
             self.editdata(*dialog.acceptdata())
+            self.references_changed()
             editedsignal.emit(self)
 
     def description_get(self):
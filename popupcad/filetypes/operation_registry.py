@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+"""
+
+
+class OperationRegistry(object):
+
+    '''
+    Lookup tables for the operations of a design: operations and positions by id, and
+    which operations refer to a given operation, output, sketch or subdesign.
+    '''
+    kinds = ['operation', 'output', 'sketch', 'subdesign']
+
+    def __init__(self, operations):
+        self.operations = operations[:]
+        self.by_id = {}
+        self._positions = None
+        self.refs = {}
+        self.users = dict([(kind, {}) for kind in self.kinds])
+        self.unindexed = []
+        for op in self.operations:
+            self.by_id[op.id] = op
+            self.add_refs(op)
+
+    def is_current(self, operations):
+        return self.operations == operations
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = dict([(op.id, ii) for ii, op in enumerate(self.operations)])
+        return self._positions
+
+    def position(self, ref):
+        return self.positions[ref]
+
+    @staticmethod
+    def find_refs(op):
+        outputrefs = [tuple(item) for item in op.outputrefs()]
+        refs = {}
+        refs['operation'] = set(op.parentrefs()) | set([ref for ref, ii in outputrefs])
+        refs['output'] = set(outputrefs)
+        refs['sketch'] = set(op.sketchrefs())
+        refs['subdesign'] = set(op.subdesignrefs())
+        return refs
+
+    def add_refs(self, op):
+        try:
+            refs = self.find_refs(op)
+        except AttributeError:
+            self.unindexed.append(op)
+            return
+        self.refs[op] = refs
+        for kind in self.kinds:
+            for ref in refs[kind]:
+                self.users[kind].setdefault(ref, set()).add(op)
+
+    def remove_refs(self, op):
+        try:
+            refs = self.refs.pop(op)
+        except KeyError:
+            if op in self.unindexed:
+                self.unindexed.remove(op)
+            return
+        for kind in self.kinds:
+            for ref in refs[kind]:
+                users = self.users[kind][ref]
+                users.discard(op)
+                if not users:
+                    del self.users[kind][ref]
+
+    def update(self, op):
+        '''re-read the references of an operation whose links have changed'''
+        if op in self.refs or op in self.unindexed:
+            self.remove_refs(op)
+            self.add_refs(op)
+
+    def insert(self, index, op):
+        self.operations.insert(index, op)
+        self.by_id[op.id] = op
+        self._positions = None
+        self.add_refs(op)
+
+    def append(self, op):
+        self.operations.append(op)
+        self.by_id[op.id] = op
+        if self._positions is not None:
+            self._positions[op.id] = len(self.operations) - 1
+        self.add_refs(op)
+
+    def pop(self, index):
+        op = self.operations.pop(index)
+        if self.by_id.get(op.id) is op:
+            del self.by_id[op.id]
+        self._positions = None
+        self.remove_refs(op)
+        return op
+
+    def find_users(self, kind, ref):
+        '''operations referring to ref, in design order.  operations whose references cannot be read are always included'''
+        users = set(self.users[kind].get(ref, set())) | set(self.unindexed)
+        return sorted(users, key=lambda op: self.position(op.id))
+
+    def used_refs(self, kind):
+        return set(self.users[kind].keys())
@@ -11,6 +11,7 @@ import popupcad
 import shapely.geometry as sg
 
 class BaseVertex(object):
+    __slots__ = ['id', '_position', '_constraints_ref']
     editable = ['position']
     hidden = ['roundvalue,yaml_node_name']
     deletable = []
@@ -20,6 +21,48 @@ class BaseVertex(object):
     def __init__(self, position,scaling = 1):
         self.id = id(self)
         self.setpos(position,scaling)
+
+    @classmethod
+    def from_positions(cls, positions, ids=None):
+        '''build one vertex per row of an (n, 2) array or sequence of positions, with new ids unless ids are given'''
+        rows = numpy.asarray(positions).tolist()
+        new_vertex = cls.__new__
+        vertices = []
+        if ids is None:
+            for row in rows:
+                new = new_vertex(cls)
+                new.id = id(new)
+                new._position = tuple(row)
+                vertices.append(new)
+        else:
+            for row, vertex_id in zip(rows, numpy.asarray(ids).tolist()):
+                new = new_vertex(cls)
+                new.id = vertex_id
+                new._position = tuple(row)
+                vertices.append(new)
+        return vertices
+
+    @classmethod
+    def slot_names(cls):
+        return [name for item in cls.__mro__ for name in getattr(item, '__slots__', [])]
+
+    def __getstate__(self):
+        return dict([(name, getattr(self, name)) for name in self.slot_names() if name != '_constraints_ref' and hasattr(self, name)])
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            dict_state, slot_state = state
+            state = {}
+            state.update(dict_state or {})
+            state.update(slot_state or {})
+        state = state.copy()
+        for name in ['_pos', '__pos', '_Vertex__pos']:
+            value = state.pop(name, None)
+            if value is not None and '_position' not in state:
+                state['_position'] = self.scale_tuple(tuple(value), 1/popupcad.deprecated_internal_argument_scaling)
+        state.pop('_constraints_ref', None)
+        for name, value in state.items():
+            setattr(self, name, value)
         
     def variables(self):
         my_id = str(self.id)
@@ -56,6 +99,13 @@ class BaseVertex(object):
         return self.constraints_ref().p()
 
     def setpos(self, pos,scaling = 1):
+        types = set([type(item) for item in pos])
+        if types <= set([int, float]) and type(scaling) in (int, float):
+            if float in types or type(scaling) is float:
+                self._position = tuple([float(item) * scaling for item in pos])
+            else:
+                self._position = tuple([item * scaling for item in pos])
+            return
         pos = numpy.array(pos)*scaling
 #        pos = pos.round(self.roundvalue)
         self._position = tuple(pos.tolist())
@@ -71,21 +121,9 @@ class BaseVertex(object):
         return new
 
     def getpos(self, scaling=1):
-        try:
-            return self.scale_tuple(self._position,scaling)
-        except AttributeError:
-            if hasattr(self,'_pos') and (self._pos is not None):
-                self._position = self.scale_tuple(self._pos,1/popupcad.deprecated_internal_argument_scaling )
-                del self._pos
-            elif hasattr(self,'__pos'):
-                self._position = self.scale_tuple(self.__pos,1/popupcad.deprecated_internal_argument_scaling )
-                del self.__pos
-            elif hasattr(self,'_Vertex__pos'):
-                self._position = self.scale_tuple(self._Vertex__pos,1/popupcad.deprecated_internal_argument_scaling )
-                del self._Vertex__pos
-            else:
-                raise Exception
-            return self.scale_tuple(self._position,scaling)
+        if scaling != 1:
+            return tuple([item * scaling for item in self._position])
+        return self._position
     position = property(getpos,setpos)
     
     @staticmethod
@@ -155,16 +193,20 @@ class BaseVertex(object):
         constraintsystem.constrained_shift([(self, dxdy)])
 
     @classmethod
-    def delistify_0(cls, id, x, y):
-        new = cls((x/popupcad.deprecated_internal_argument_scaling, y/popupcad.deprecated_internal_argument_scaling))
-        new.id = id
+    def from_position(cls, position, vertex_id, scaling=1):
+        '''a single vertex with a known id, without the work __init__ does to assign a new one'''
+        new = cls.__new__(cls)
+        new.id = vertex_id
+        new.setpos(position, scaling)
         return new
 
+    @classmethod
+    def delistify_0(cls, id, x, y):
+        return cls.from_position((x/popupcad.deprecated_internal_argument_scaling, y/popupcad.deprecated_internal_argument_scaling), id)
+
     @classmethod
     def delistify_1(cls, id, x, y):
-        new = cls((x, y))
-        new.id = id
-        return new
+        return cls.from_position((x, y), id)
 
     def listify(self):
         x, y = self.getpos()
@@ -189,6 +231,8 @@ class BaseVertex(object):
         return new
 
 class ReferenceVertex(BaseVertex):
+    __slots__ = []
+
     def gen_interactive(self):
         from popupcad.graphics2d.interactivevertex import ReferenceInteractiveVertex
         iv = ReferenceInteractiveVertex(self)
@@ -196,6 +240,7 @@ class ReferenceVertex(BaseVertex):
         return iv
 
 class ShapeVertex(BaseVertex):
+    __slots__ = []
     yaml_node_name_0 = u'!ShapeVertex'
     yaml_node_name_1 = u'!ShapeVertex_1'
 
@@ -207,6 +252,7 @@ class ShapeVertex(BaseVertex):
 
 #TODO: does DrawnPoint really need to be a child class of ShapeVertex, or can it be a child of BaseVertex?
 class DrawnPoint(BaseVertex):
+    __slots__ = ['construction']
     editable = ShapeVertex.editable + ['construction']
     yaml_node_name_0 = u'!DrawnPoint'
     yaml_node_name_1 = u'!DrawnPoint_1'
@@ -275,15 +321,13 @@ class DrawnPoint(BaseVertex):
         model_space.add_point(self.getpos(),dxfattribs = dxfattribs)    
     @classmethod
     def delistify_0(cls, id, x, y, is_construction):
-        new = cls((x/popupcad.deprecated_internal_argument_scaling, y/popupcad.deprecated_internal_argument_scaling))
-        new.id = id
+        new = super(DrawnPoint, cls).delistify_0(id, x, y)
         new.set_construction(is_construction)
         return new
 
     @classmethod
     def delistify_1(cls, id, x, y, is_construction):
-        new = cls((x, y))
-        new.id = id
+        new = super(DrawnPoint, cls).delistify_1(id, x, y)
         new.set_construction(is_construction)
         return new
 
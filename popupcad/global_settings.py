@@ -36,6 +36,7 @@ triangulation_scaling = 1e3
 geometry_round_value = 8
 distinguishable_number_difference = 10**(-geometry_round_value)
 undistinguishable_number_difference = 10**(-geometry_round_value - 1)
+csg_fixed_precision = True
 
 SI_length_scaling = 1000
 
@@ -54,6 +55,17 @@ version = basic_functions.return_formatted_time(
     big_separator='.')
 
 default_buffer_resolution = 4
+csg_threads = 1
+buffer_cache = False
+buffer_cache_size = 1000
+
+regeneration_cache = True
+regeneration_processes = 1
+lazy_regeneration = True
+background_regeneration = True
+regeneration_disk_cache = False
+regeneration_disk_cache_limit = 500 * 2**20
+regeneration_profile_memory = False
 
 gui_default_decimals = 6
 
@@ -89,6 +101,7 @@ exportdir = os.path.normpath(os.path.join(popupcad_home_path, 'export'))
 sketchdir = os.path.normpath(os.path.join(popupcad_home_path, 'sketches'))
 shapedir = os.path.normpath(os.path.join(popupcad_home_path, 'shapes'))
 backupdir = os.path.normpath(os.path.join(popupcad_home_path, 'backup'))
+regeneration_cache_dir = os.path.normpath(os.path.join(popupcad_home_path, 'regeneration_cache'))
 
 user_materials_filename = os.path.normpath(os.path.join(popupcad_home_path,'materials.yaml'))
 internal_materials_filename = os.path.normpath(os.path.join(supportfiledir,'materials.yaml'))
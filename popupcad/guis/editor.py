@@ -15,7 +15,8 @@ import imp
 from popupcad.widgets.export_widget import DxfExportWidget
 import popupcad
 
-from popupcad.filetypes.design import Design
+from popupcad.filetypes.design import Design, NoOperation
+from popupcad.guis.regeneration_thread import RegenerationThread
 
 class NoOutput(Exception):
     def __init__(self):
@@ -42,6 +43,7 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
         """
         super(Editor, self).__init__(parent)
         self.error_log = popupcad.widgets.errorlog.ErrorLog()
+        self.regeneration_thread = None
         self.safe_init(parent, **kwargs)
 
     
@@ -187,6 +189,24 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
         hierarchy_dock.setWindowTitle('Hierarchy')
         self.addDockWidget(qc.Qt.RightDockWidgetArea, hierarchy_dock)
 
+    def profile_rebuild(self):
+        from popupcad.widgets.regeneration_report import RegenerationReportWidget
+        self.finish_regeneration()
+        try:
+            self.design.reprocessoperations(profile=True)
+        finally:
+            self.operationeditor.refresh()
+        widget = RegenerationReportWidget(self.design.regeneration_report)
+        try:
+            self.profile_dock.setWidget(widget)
+        except AttributeError:
+            self.profile_dock = qg.QDockWidget()
+            self.profile_dock.setWidget(widget)
+            self.profile_dock.setAllowedAreas(qc.Qt.AllDockWidgetAreas)
+            self.profile_dock.setWindowTitle('Regeneration Profile')
+            self.addDockWidget(qc.Qt.BottomDockWidgetArea, self.profile_dock)
+        self.profile_dock.show()
+
     @property
     def design(self):
         return self._design
@@ -214,16 +234,30 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
     def newoperationslot(self, operation):
         self.design.append_operation(operation)
         if self.menu_system.actions['project_auto_reprocess'].isChecked():
-            self.reprocessoperations([operation])
+            self.reprocess_edited([operation])
     
     def editedoperationslot(self, operation):
         if self.menu_system.actions['project_auto_reprocess'].isChecked():
-            self.reprocessoperations([operation])
+            self.reprocess_edited([operation])
+
+    def reprocess_edited(self, operations):
+        if popupcad.lazy_regeneration:
+            self.cancel_regeneration()
+            self.design.mark_dirty(operations)
+            try:
+                self.showcurrentoutput()
+            finally:
+                self.operationeditor.refresh()
+        else:
+            self.reprocessoperations(operations)
     
     def reprocessoperations_outer(self):
         self.reprocessoperations(None)
         
     def reprocessoperations(self, operations=None):
+        if popupcad.background_regeneration:
+            self.start_regeneration(operations, zoom_to_fit=True)
+            return
         try:
             self.design.reprocessoperations(operations)
             self.operationeditor.refresh()
@@ -234,6 +268,73 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
         finally:
             self.operationeditor.refresh()
 
+    def start_regeneration(self, operations=None, target=None, zoom_to_fit=False):
+        '''regenerate in the background, replacing any regeneration still running'''
+        previous = self.regeneration_thread
+        if previous is not None:
+            previous.cancel()
+            if target is None and previous.target is None and not previous.completed:
+                if operations is None or previous.operations is None:
+                    operations = None
+                else:
+                    operations = previous.operations + operations
+                zoom_to_fit = zoom_to_fit or previous.zoom_to_fit
+        thread = RegenerationThread(self.design, operations, target, previous)
+        thread.zoom_to_fit = zoom_to_fit
+        thread.operation_finished.connect(self.regeneration_progress)
+        thread.regeneration_failed.connect(self.regeneration_failed)
+        thread.regeneration_done.connect(self.regeneration_done)
+        self.regeneration_thread = thread
+        thread.start()
+
+    def cancel_regeneration(self):
+        if self.regeneration_thread is not None:
+            self.regeneration_thread.cancel()
+
+    def finish_regeneration(self):
+        '''block until the background regeneration is done, before using the design from this thread'''
+        thread = self.regeneration_thread
+        if thread is not None:
+            thread.wait()
+            thread.apply_results()
+
+    def regeneration_running(self):
+        thread = self.regeneration_thread
+        return thread is not None and not thread.cancelled and thread.target is None
+
+    def regeneration_progress(self, thread, ref):
+        if thread is not self.regeneration_thread:
+            return
+        thread.apply_results()
+        try:
+            operation = self.design.op_from_ref(ref)
+        except NoOperation:
+            return
+        self.statusBar().showMessage('Regenerated ' + str(operation))
+        selected_indeces = self.operationeditor.currentIndeces2()
+        if len(selected_indeces) > 0:
+            ii, jj = selected_indeces[0]
+            if self.design.operations[ii] is operation:
+                self.showoutput(ii, jj)
+
+    def regeneration_failed(self, thread, ex):
+        if thread is not self.regeneration_thread:
+            return
+        self.statusBar().showMessage('Regeneration failed')
+        sys.excepthook(type(ex), ex, ex.__traceback__)
+
+    def regeneration_done(self, thread):
+        if thread is not self.regeneration_thread:
+            return
+        thread.apply_results()
+        self.regeneration_thread = None
+        self.operationeditor.refresh()
+        if thread.completed:
+            self.statusBar().showMessage('Regeneration complete')
+            self.showcurrentoutput()
+            if thread.zoom_to_fit:
+                self.view_2d.zoomToFit()
+
     def newfile(self):
         from popupcad.filetypes.layerdef import LayerDef
         import popupcad.filetypes.material2 as materials
@@ -270,6 +371,7 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
         return value
     
     def load_design(self, design):
+        self.cancel_regeneration()
         self.design = design
         self.operationeditor.blockSignals(True)
         self.layerlistwidget.blockSignals(True)
@@ -335,8 +437,22 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
     def showcurrentoutput_inner(self, ii, jj):
         self.scene.deleteall()
         self.view_3d.view.clear()
+        operation = self.design.operations[ii]
+        if self.menu_system.actions['project_auto_reprocess'].isChecked():
+            if not popupcad.background_regeneration:
+                self.design.pull_output(operation)
+            elif len(self.design.needs_regeneration(operation))>0:
+                if not self.regeneration_running():
+                    self.start_regeneration(target=operation)
+                return
+        self.showoutput(ii, jj)
+
+    def showoutput(self, ii, jj):
+        self.scene.deleteall()
+        self.view_3d.view.clear()
+        operation = self.design.operations[ii]
         try:
-            operationoutput = self.design.operations[ii].output[jj]
+            operationoutput = operation.output[jj]
         except IndexError:
             raise
         except AttributeError:
@@ -381,6 +497,8 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
             ii, jj = -1, 0
             self.operationeditor.selectIndeces([(ii, jj)])
 
+        self.finish_regeneration()
+        self.design.pull_output(self.design.operations[ii])
         generic_laminate = self.design.operations[ii].output[jj].generic_laminate()
 
         for layernum, layer in enumerate(self.design.return_layer_definition().layers[::1]):
@@ -392,6 +510,8 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
 
     def closeEvent(self, event):
         if self.checkSafe():
+            self.cancel_regeneration()
+            self.finish_regeneration()
             self.error_log.close()
             event.accept()
         else:
@@ -441,6 +561,7 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
         self.design.replace_op_refs(
             (operation_ref, output_index), (newop.id, 0))
         newop.operation_links['unary'].append((operation_ref, output_index))
+        newop.references_changed()
         self.reprocessoperations()
 
     def upgrade(self):
@@ -476,6 +597,8 @@ class Editor(popupcad.widgets.widgetcommon.MainGui, qg.QMainWindow):
         if result:
             accept_data = dialog.accept_data()
             ii, jj = self.operationeditor.currentIndeces2()[0]
+            self.finish_regeneration()
+            self.design.pull_output(self.design.operations[ii])
             output = self.design.operations[ii].output[jj]
             generic = output.generic_laminate()
             basename = self.design.get_basename() + '_'+str(self.design.operations[ii])
@@ -58,6 +58,7 @@ if __name__=='__main__':
     action_setup['project_replace'] = {'text': 'Replace...'}
     action_setup['project_insert_and_replace'] = {'text': 'Insert Laminate Op and Replace...'}
     action_setup['project_hierarchy'] = {'text': 'Hierarchy'}
+    action_setup['project_profile'] = {'text': 'Profile Rebuild'}
     
     menu_struct['Project']=['project_rebuild',
                         'project_auto_reprocess',
@@ -67,7 +68,8 @@ if __name__=='__main__':
                         'project_subdesigns',
                         'project_replace',
                         'project_insert_and_replace',
-                        'project_hierarchy']
+                        'project_hierarchy',
+                        'project_profile']
     
     action_setup['view_3d'] = {'text': '3D View','kwargs': {'icon': 'printapede'},'is_checkable':True,'is_checked':False}
     action_setup['view_operations'] = {'text': 'Operations','kwargs': {'icon': 'operations'},'is_checkable':True,'is_checked':True}
@@ -173,6 +175,7 @@ if __name__=='__main__':
     triggered['project_replace'] = 'replace'
     triggered['project_insert_and_replace'] = 'insert_and_replace'
     triggered['project_hierarchy'] = 'operation_network'
+    triggered['project_profile'] = 'profile_rebuild'
     
     triggered['view_3d'] = 'show_hide_view_3d'
     triggered['view_operations'] = 'show_hide_operationdock'
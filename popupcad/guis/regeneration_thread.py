@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+"""
+
+import collections
+import qt.QtCore as qc
+import popupcad
+from popupcad.filetypes.design import RegenCancelled, NoOperation
+
+def designs_in(design, path=()):
+    '''the design and its subdesigns, each with the path of subdesign keys leading to it'''
+    yield path, design
+    for key, subdesign in design.subdesigns.items():
+        for item in designs_in(subdesign, path + (key,)):
+            yield item
+
+def resolve(design, path):
+    for key in path:
+        design = design.subdesigns[key]
+    return design
+
+class RegenerationThread(qc.QThread):
+    '''
+    regenerates a copy of a design away from the gui thread, so the gui can keep reading and editing the design meanwhile.
+    what each operation generated is queued and applied to the design by apply_results, which is called from the gui thread.
+    cancellation takes effect once the operation currently being generated is done, and drops whatever has not been applied.
+    '''
+    operation_finished = qc.Signal(object, object)
+    regeneration_failed = qc.Signal(object, object)
+    regeneration_done = qc.Signal(object)
+
+    def __init__(self, design, operations=None, target=None, previous=None):
+        super(RegenerationThread, self).__init__()
+        self.design = design
+        self.work = design.copy_for_regeneration()
+        self.operations = operations
+        self.target = target
+        self.previous = previous
+        self.cancelled = False
+        self.completed = False
+        self.zoom_to_fit = False
+        self.results = collections.deque()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def collect(self, path, design, operation):
+        '''queue what operation generated since the regeneration started, pickled against its design'''
+        before = self.before[(path, operation.id)]
+        state = popupcad.algorithms.regen_disk_cache.changed_state(operation, before)
+        data = popupcad.algorithms.parallel_regen.dumps(state, design)
+        self.results.append((path, operation.id, operation.regen_key, data))
+
+    def progress(self, operation):
+        self.collect((), self.work, operation)
+        self.operation_finished.emit(self, operation.id)
+        if self.cancelled:
+            raise RegenCancelled()
+
+    def run(self):
+        try:
+            if self.previous is not None:
+                self.previous.wait()
+                self.previous = None
+            if self.cancelled:
+                return
+            self.before = {}
+            for path, design in designs_in(self.work):
+                for operation in design.operations:
+                    self.before[(path, operation.id)] = operation.__dict__.copy()
+            subdesigns_were_reprocessed = self.work.subdesigns_are_reprocessed
+            try:
+                if self.target is not None:
+                    self.work.pull_output(self.work.op_from_ref(self.target.id), progress=self.progress)
+                elif self.operations is None:
+                    self.work.reprocessoperations(progress=self.progress)
+                else:
+                    operations = [self.work.op_from_ref(operation.id) for operation in self.operations]
+                    self.work.reprocessoperations(operations, progress=self.progress)
+            finally:
+                if self.work.subdesigns_are_reprocessed and not subdesigns_were_reprocessed:
+                    for path, design in designs_in(self.work):
+                        if path:
+                            for operation in design.operations:
+                                self.collect(path, design, operation)
+            self.completed = True
+        except RegenCancelled:
+            pass
+        except Exception as ex:
+            self.regeneration_failed.emit(self, ex)
+        finally:
+            self.regeneration_done.emit(self)
+
+    def apply_results(self):
+        '''move queued results onto the design. call from the gui thread only'''
+        while len(self.results) > 0:
+            path, ref, key, data = self.results.popleft()
+            if self.cancelled:
+                continue
+            try:
+                design = resolve(self.design, path)
+                operation = design.op_from_ref(ref)
+            except (KeyError, NoOperation):
+                continue
+            for name, value in popupcad.algorithms.parallel_regen.loads(data, design).items():
+                setattr(operation, name, value)
+            operation.regen_key = key
+            operation.dirty = False
+        if self.completed and not self.cancelled and self.work.subdesigns_are_reprocessed:
+            self.design.subdesigns_are_reprocessed = True
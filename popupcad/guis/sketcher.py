@@ -412,6 +412,7 @@ class Sketcher(MainGui,qg.QMainWindow):
             if self.design is not None:
                 print(ii, jj)
                 try:
+                    self.design.pull_output(self.design.operations[ii])
                     operationgeometries = self.design.operations[ii].output[jj].controlpolygons()
                     staticgeometries = [item.outputstatic() for item in operationgeometries]
 
@@ -478,6 +479,7 @@ class Sketcher(MainGui,qg.QMainWindow):
                     if self.design is not None:
                         print(ii, jj)
                         try:
+                            self.design.pull_output(self.design.operations[ii])
                             operationgeometries = self.design.operations[ii].output[jj].controlpolygons()
                             staticgeometries = [item.copy().outputinteractive() for item in operationgeometries]
         
@@ -11,6 +11,7 @@ from popupcad.widgets.userinput import UserInputIDE
 
 class CodeExecOperation(Operation2):
     name = 'Code Execution Operation'
+    parallel_safe = False
     code = ""    
     
     def __init__(self, *args):
@@ -42,6 +43,10 @@ class CodeExecOperation(Operation2):
         mw.te.setPlainText(self.code)     
         return mw
 
+    def parameter_key(self):
+        # user code can read anything from the design, so its output is never reused
+        return None
+
     def operate(self, design):
         result = None
         my_locals = {'design':design,'result':result}
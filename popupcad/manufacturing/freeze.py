@@ -5,6 +5,7 @@ Email: danaukes<at>asu.edu.
 Please see LICENSE for full license.
 """
 
+import popupcad
 from popupcad.filetypes.laminate import Laminate
 from popupcad.filetypes.operation2 import Operation2
 
@@ -72,6 +73,13 @@ class Freeze(Operation2):
         new.customname = self.customname
         return new
 
+    def parameter_key(self):
+        # the frozen laminate is rebuilt with a new id(self) whenever the design is loaded, so it is hashed without it
+        new = self.copy()
+        new.generic = self.generic.copy()
+        new.generic.id = None
+        return popupcad.algorithms.content_hash.hash_yaml(new)
+
     def operate(self, design):
         layerdef = design.return_layer_definition()
         csg = Laminate(layerdef)
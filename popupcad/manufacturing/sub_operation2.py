@@ -230,16 +230,50 @@ class SubOperation2(Operation2):
             self)
         return dialog
 
+    def evaluation_key(self, design, inputs):
+        '''identifies the subdesign, the sketches and laminates substituted into it, and the outputs taken from it'''
+        hash_strings = popupcad.algorithms.content_hash.hash_strings
+        subdesign_key = design.content_key(design.subdesigns[self.design_links['source'][0]])
+        sketch_keys = [hash_strings(item.ref1, design.content_key(design.sketches[item.ref2])) for item in self.sketch_list]
+        input_keys = [hash_strings(item.ref1, popupcad.algorithms.content_hash.hash_laminate(csg)) for item, csg in zip(self.input_list, inputs)]
+        output_keys = [hash_strings(item.ref1, item.shift) for item in self.output_list]
+        return hash_strings(
+            subdesign_key,
+            design.content_key(design.return_layer_definition()),
+            hash_strings(*sketch_keys),
+            hash_strings(*input_keys),
+            hash_strings(*output_keys))
+
     def generate(self, design):
+        inputs = []
+        for input_data in self.input_list:
+            to_ref = input_data.ref2
+            csg = design.op_from_ref(to_ref[0]).output[to_ref[1]].csg
+            csg2 = popupcad.algorithms.manufacturing_functions.shift_flip_rotate(csg,input_data.shift,False,False)
+            inputs.append(csg2)
+
+        key = self.evaluation_key(design, inputs)
+        cache = design.subdesign_outputs()
+        try:
+            outputs = cache[key]
+        except KeyError:
+            outputs = self.evaluate(design, inputs)
+            cache[key] = outputs
+
+        self.output = []
+        for csg, name in outputs:
+            output2 = popupcad.filetypes.operationoutput.OperationOutput(csg,name)
+            self.output.append(output2)
+
+    def evaluate(self, design, inputs):
         from popupcad.manufacturing.dummy_operation1 import DummyOp1
         
         subdesign_orig = design.subdesigns[self.design_links['source'][0]]
-        subdesign = subdesign_orig.copy_yaml()
+        subdesign = subdesign_orig.copy_for_evaluation()
 
-        sketches = design.sketches.copy()
-        for key,value in sketches.items():
-            sketches[key] = value.copy()
-        subdesign.sketches.update(sketches)
+        for sketch_data in self.sketch_list:
+            to_ref = sketch_data.ref2
+            subdesign.sketches[to_ref] = design.sketches[to_ref]
 
         layerdef_subdesign = subdesign.return_layer_definition()
         layerdef_design = design.return_layer_definition()
@@ -249,12 +283,8 @@ class SubOperation2(Operation2):
             to_ref = sketch_data.ref2
             subdesign.replace_sketch_refs_force(from_ref, to_ref)
 
-        for input_data in self.input_list:
+        for input_data, csg2 in zip(self.input_list, inputs):
             from_ref = input_data.ref1
-            to_ref = input_data.ref2
-
-            csg = design.op_from_ref(to_ref[0]).output[to_ref[1]].csg
-            csg2 = popupcad.algorithms.manufacturing_functions.shift_flip_rotate(csg,input_data.shift,False,False)
             csg3 = csg2.switch_layer_defs(layerdef_subdesign)
             dummy_op = DummyOp1(csg3)
             to_ref2 = (dummy_op.id,0)
@@ -263,22 +293,24 @@ class SubOperation2(Operation2):
 
         subdesign.reprocessoperations()
 
-        self.output = []
+        outputs = []
         for output_data in self.output_list:
             new_output = subdesign.op_from_ref(output_data.ref1[0]).output[output_data.ref1[1]]
             csg= new_output.csg
             csg2 = csg.switch_layer_defs(layerdef_design)
             csg3 = popupcad.algorithms.manufacturing_functions.shift_flip_rotate(csg2,output_data.shift,False,False)
-            output2 = popupcad.filetypes.operationoutput.OperationOutput(csg3,new_output.name)
-            self.output.append(output2)
+            outputs.append((csg3,new_output.name))
+        return outputs
 
-            
     def parentrefs(self):
         a = []
         for item in self.input_list:
             a.append(item.ref2[0])
         return a
 
+    def outputrefs(self):
+        return [item.ref2 for item in self.input_list]
+
     def sketchrefs(self):
         a = []
         for item in self.sketch_list:
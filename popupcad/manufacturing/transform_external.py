@@ -241,7 +241,9 @@ class TransformExternal(Operation2):
         sketch_from = subdesign.sketches[sketch_from_id]
         sketch_to = design.sketches[sketch_to_id]
         operation_ref, output_index = self.subopref
-        csg_laminate = subdesign.operations[subdesign.operation_index(operation_ref)].output[output_index].csg
+        suboperation = subdesign.operations[subdesign.operation_index(operation_ref)]
+        subdesign.pull_output(suboperation)
+        csg_laminate = suboperation.output[output_index].csg
         
         for geom in sketch_from.operationgeometry:
             if not geom.is_construction():
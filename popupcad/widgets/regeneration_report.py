@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+"""
+import os
+import qt.QtCore as qc
+import qt.QtGui as qg
+import popupcad
+
+class NumericItem(qg.QTableWidgetItem):
+    def __init__(self, value, text):
+        super(NumericItem, self).__init__(text)
+        self.value = value
+
+    def __lt__(self, other):
+        try:
+            return self.value < other.value
+        except (AttributeError, TypeError):
+            return super(NumericItem, self).__lt__(other)
+
+class RegenerationReportWidget(qg.QWidget):
+    columns = ['operation', 'type', 'wall_time', 'cpu_time', 'memory_peak', 'input_vertices', 'output_vertices']
+    headers = ['Operation', 'Type', 'Wall (s)', 'CPU (s)', 'Peak Python Memory (kB)', 'Input Vertices', 'Output Vertices']
+
+    def __init__(self, report):
+        super(RegenerationReportWidget, self).__init__()
+        self.report = report
+
+        self.table = qg.QTableWidget(len(report.profiles), len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.headers)
+        self.table.setEditTriggers(qg.QAbstractItemView.NoEditTriggers)
+        for ii, profile in enumerate(report.profiles):
+            for jj, field in enumerate(self.columns):
+                self.table.setItem(ii, jj, self.build_item(field, getattr(profile, field)))
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(self.columns.index('wall_time'), qc.Qt.DescendingOrder)
+        self.table.resizeColumnsToContents()
+
+        button_csv = qg.QPushButton('Export CSV...')
+        button_json = qg.QPushButton('Export JSON...')
+        button_csv.clicked.connect(self.export_csv)
+        button_json.clicked.connect(self.export_json)
+
+        sublayout = qg.QHBoxLayout()
+        sublayout.addWidget(qg.QLabel('Total: {0:.3f} s'.format(report.total_wall_time)))
+        sublayout.addStretch()
+        sublayout.addWidget(button_csv)
+        sublayout.addWidget(button_json)
+
+        layout = qg.QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addLayout(sublayout)
+        self.setLayout(layout)
+
+    @staticmethod
+    def build_item(field, value):
+        if field in ['wall_time', 'cpu_time']:
+            return NumericItem(value, '{0:.4f}'.format(value))
+        elif field == 'memory_peak':
+            if value is None:
+                return NumericItem(-1, '')
+            return NumericItem(value, '{0:.1f}'.format(value / 1024.))
+        elif field in ['input_vertices', 'output_vertices']:
+            return NumericItem(value, str(value))
+        return qg.QTableWidgetItem(str(value))
+
+    def export(self, file_filter, extension, method):
+        filename, selected_filter = qg.QFileDialog.getSaveFileName(self, 'Export Report', os.path.join(popupcad.exportdir, 'regeneration_report.' + extension), filter=file_filter)
+        if filename:
+            method(filename)
+
+    def export_csv(self):
+        self.export('CSV(*.csv)', 'csv', self.report.to_csv)
+
+    def export_json(self):
+        self.export('JSON(*.json)', 'json', self.report.to_json)
@@ -34,11 +34,15 @@ def initialize(program):
 def export_dae(program):
     editor = program.editor
     ii, jj = editor.operationeditor.currentIndeces2()[0]
+    editor.finish_regeneration()
+    editor.design.pull_output(editor.design.operations[ii])
     output = editor.design.operations[ii].output[jj]
     output.generic_laminate().toDAE()
 
 def export_stl(program):
     editor = program.editor
     ii, jj = editor.operationeditor.currentIndeces2()[0]
+    editor.finish_regeneration()
+    editor.design.pull_output(editor.design.operations[ii])
     output = editor.design.operations[ii].output[jj]
     output.generic_laminate().toSTL()
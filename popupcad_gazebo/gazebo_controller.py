@@ -258,6 +258,8 @@ def export(program):
         widget.setWindowModality(qc.Qt.NonModal)
         widget.exec_() 
     else:
+        program.editor.finish_regeneration()
+        design.pull_output(operation)
         export_inner(operation)
        
     
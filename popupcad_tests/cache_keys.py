@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+
+Regenerates the test files in two separate processes, with different hash seeds,
+and checks that every operation gets a content key and that the keys agree,
+so that disk cache entries written by one session are found by the next.
+
+    python popupcad_tests/cache_keys.py qt5
+"""
+import sys
+import os
+import json
+import shutil
+import subprocess
+import tempfile
+import popupcad
+from popupcad.filetypes.design import Design
+
+test_files = ['basic_operations.cad', 'pendulum.cad']
+
+def regeneration_keys():
+    popupcad.regeneration_disk_cache = False
+    keys = {}
+    for filename in test_files:
+        design = Design.load_yaml(os.path.join(popupcad.test_file_dir, filename))
+        design = design.upgrade()
+        design.update_operation_design()
+        design.reprocessoperations()
+        keys[filename] = [(str(operation), operation.regen_key) for operation in design.operations]
+    return keys
+
+def keys_from_process(hash_seed, filename):
+    env = os.environ.copy()
+    env['PYTHONHASHSEED'] = str(hash_seed)
+    subprocess.check_call([sys.executable, os.path.abspath(__file__), '--dump', filename] + sys.argv[1:], env=env)
+    with open(filename) as f:
+        return json.load(f)
+
+if __name__=='__main__':
+    if '--dump' in sys.argv:
+        with open(sys.argv[sys.argv.index('--dump') + 1], 'w') as f:
+            json.dump(regeneration_keys(), f)
+        sys.exit()
+
+    directory = tempfile.mkdtemp()
+    try:
+        keys1 = keys_from_process(1, os.path.join(directory, 'keys1.json'))
+        keys2 = keys_from_process(2, os.path.join(directory, 'keys2.json'))
+    finally:
+        shutil.rmtree(directory)
+
+    failed = []
+    for filename in test_files:
+        mismatches = []
+        for (name, key1), (name2, key2) in zip(keys1[filename], keys2[filename]):
+            if key1 is None:
+                mismatches.append('{0} {1}: no key'.format(filename, name))
+            elif key1 != key2:
+                mismatches.append('{0} {1}: {2} != {3}'.format(filename, name, key1, key2))
+        print(filename, len(keys1[filename]), 'operations,', len(mismatches), 'mismatches')
+        failed.extend(mismatches)
+
+    for failure in failed:
+        print(failure)
+    if len(failed)>0:
+        raise(Exception('regeneration keys differ between processes.'))
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+
+Checks Layer.binaryoperation, which only passes overlapping pieces to geos, against Layer.binaryoperation_full,
+for layers whose entities overlap one another as well as layers that are already dissolved,
+and checks that a geometry geos cannot union leaves the rest of a union_tree intact.
+
+    python popupcad_tests/layer_operations.py qt5
+"""
+import random
+import shapely.geometry as sg
+import popupcad
+from popupcad.filetypes.layer import Layer
+
+def random_geom(polygons_only):
+    x, y = random.uniform(0, 100), random.uniform(0, 100)
+    r = random.random()
+    if polygons_only or r < .6:
+        return sg.box(x, y, x + random.uniform(1, 20), y + random.uniform(1, 20))
+    if r < .9:
+        return sg.LineString([(x, y), (x + random.uniform(-20, 20), y + random.uniform(-20, 20))])
+    return sg.Point(x, y)
+
+def random_layer(dissolved, polygons_only):
+    geoms = [random_geom(polygons_only) for ii in range(random.randint(0, 6))]
+    if dissolved:
+        geoms = popupcad.algorithms.csg_shapely.condition_shapely_entities(popupcad.algorithms.csg_shapely.unary_union_safe(geoms))
+    return Layer(geoms)
+
+def same_result(layer1, layer2):
+    '''the same pieces, compared as geometry rather than by where their rings start'''
+    geoms1 = sorted(layer1.geoms, key=lambda geom: (geom.geom_type, geom.bounds))
+    geoms2 = sorted(layer2.geoms, key=lambda geom: (geom.geom_type, geom.bounds))
+    return len(geoms1) == len(geoms2) and all([geom1.equals(geom2) for geom1, geom2 in zip(geoms1, geoms2)])
+
+def check_overlapping_entities():
+    '''two overlapping boxes minus a box away from both come out as the single merged polygon'''
+    layer1 = Layer([sg.box(0, 0, 2, 2), sg.box(1, 1, 3, 3)])
+    layer2 = Layer([sg.box(10, 10, 11, 11)])
+    failed = []
+    for functionname in Layer.envelope_filtered:
+        for item1, item2 in [(layer1, layer2), (layer2, layer1), (layer1, Layer([])), (Layer([]), layer1)]:
+            result = item1.binaryoperation(item2, functionname)
+            if not same_result(result, item1.binaryoperation_full(item2, functionname)):
+                failed.append('{0}: {1} pieces'.format(functionname, len(result.geoms)))
+    return failed
+
+def check_random(trials):
+    failed = 0
+    count = 0
+    for functionname in Layer.envelope_filtered:
+        for ii in range(trials):
+            dissolved = random.random() < .5
+            polygons_only = random.random() < .5
+            layer1 = random_layer(dissolved, polygons_only)
+            layer2 = random_layer(dissolved, polygons_only)
+            try:
+                expected = layer1.binaryoperation_full(layer2, functionname)
+            except Exception:
+                # geos rejects some mixed dimension inputs outright, which binaryoperation does not change
+                continue
+            count += 1
+            if not same_result(layer1.binaryoperation(layer2, functionname), expected):
+                failed += 1
+    return failed, count
+
+def check_union_tree(count):
+    '''
+    union count separate boxes, with one of them, in each position in turn, made to fail every union it takes part in.
+    only that box may be left out.
+    '''
+    csg_shapely = popupcad.algorithms.csg_shapely
+    overlay = csg_shapely.overlay
+    boxes = [sg.box(ii * 2, 0, ii * 2 + 1, 1) for ii in range(count)]
+    failed = []
+    try:
+        for bad in range(count):
+            def failing_overlay(geom1, functionname, geom2):
+                if geom1.intersects(boxes[bad]) or geom2.intersects(boxes[bad]):
+                    raise csg_shapely.GEOSException('bad geometry')
+                return overlay(geom1, functionname, geom2)
+            csg_shapely.overlay = failing_overlay
+            result, left_out = csg_shapely.union_tree(boxes, list(range(count)))
+            if left_out != [bad] or abs(result.area - (count - 1)) > 1e-9:
+                failed.append('bad box {0}: left out {1}, area {2}'.format(bad, left_out, result.area))
+    finally:
+        csg_shapely.overlay = overlay
+    return failed
+
+if __name__=='__main__':
+    random.seed(0)
+    failed = []
+    for fixed_precision in [False, True]:
+        popupcad.csg_fixed_precision = fixed_precision
+        mismatches = check_overlapping_entities()
+        print('fixed precision' if fixed_precision else 'floating precision', 'overlapping entities:', len(mismatches), 'mismatches')
+        failed.extend(mismatches)
+        mismatches, count = check_random(500)
+        print('fixed precision' if fixed_precision else 'floating precision', 'random layers:', mismatches, 'of', count, 'differ')
+        if mismatches > 0:
+            failed.append('{0} random layers differ'.format(mismatches))
+
+    for count in [2, 3, 9, 50]:
+        mismatches = check_union_tree(count)
+        print('union_tree of', count, 'with one bad geometry:', len(mismatches), 'mismatches')
+        failed.extend(mismatches)
+
+    for mismatch in failed:
+        print(mismatch)
+    if len(failed)>0:
+        raise(Exception('layer operations failed.'))
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Written by Daniel M. Aukes and CONTRIBUTORS
+Email: danaukes<at>asu.edu.
+Please see LICENSE for full license.
+
+Regenerates the test files and checks that
+ - serial regeneration matches regeneration_reference.json, written from the code before regeneration was optimized:
+   exactly under floating precision, and to within the precision grid under fixed precision
+ - regeneration across worker processes gives the same geometry as serial regeneration
+
+    python popupcad_tests/regeneration_outputs.py qt5
+    python popupcad_tests/regeneration_outputs.py qt5 --write-reference
+"""
+import sys
+import os
+import json
+import popupcad
+from popupcad.filetypes.design import Design
+
+reference_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regeneration_reference.json')
+test_files = ['basic_operations.cad', 'pendulum.cad']
+
+def regenerate(filename, processes=1, fixed_precision=True):
+    popupcad.regeneration_processes = processes
+    popupcad.regeneration_disk_cache = False
+    popupcad.csg_fixed_precision = fixed_precision
+    design = Design.load_yaml(os.path.join(popupcad.test_file_dir, filename))
+    design = design.upgrade()
+    design.update_operation_design()
+    design.reprocessoperations()
+    return design
+
+def layer_geoms(design):
+    '''the shapely geometry of every layer of every output, by operation'''
+    operations = []
+    for operation in design.operations:
+        outputs = []
+        for output in operation.output:
+            outputs.append([output.csg.layer_sequence[layer].geoms for layer in output.csg.layerdef.layers])
+        operations.append(outputs)
+    return operations
+
+def vertex_count(geom):
+    try:
+        return len(geom.coords)
+    except NotImplementedError:
+        return sum([len(ring.coords) for ring in [geom.exterior] + list(geom.interiors)])
+
+def summarize(design):
+    summary = []
+    for operation, outputs in zip(design.operations, layer_geoms(design)):
+        items = []
+        for layers in outputs:
+            items.append([{'count': len(geoms),
+                           'area': sum([geom.area for geom in geoms]),
+                           'length': sum([geom.length for geom in geoms]),
+                           'vertices': sum([vertex_count(geom) for geom in geoms])} for geoms in layers])
+        summary.append({'operation': str(operation), 'outputs': items})
+    return summary
+
+def compare_summaries(reference, summary, grid):
+    '''
+    mismatches between a reference summary and a new one.
+    snapping to a grid moves each vertex by less than grid, which bounds how far areas and lengths may move.
+    '''
+    mismatches = []
+    if [item['operation'] for item in reference] != [item['operation'] for item in summary]:
+        return ['operations differ']
+    for ii, (item1, item2) in enumerate(zip(reference, summary)):
+        if len(item1['outputs']) != len(item2['outputs']):
+            mismatches.append('{0}:{1} output count'.format(ii, item1['operation']))
+            continue
+        for jj, (layers1, layers2) in enumerate(zip(item1['outputs'], item2['outputs'])):
+            for kk, (layer1, layer2) in enumerate(zip(layers1, layers2)):
+                label = '{0}:{1} output {2} layer {3}'.format(ii, item1['operation'], jj, kk)
+                if layer1['count'] != layer2['count']:
+                    mismatches.append('{0} count {1} != {2}'.format(label, layer1['count'], layer2['count']))
+                if abs(layer1['area'] - layer2['area']) > 1e-9 * layer1['area'] + grid * layer1['length']:
+                    mismatches.append('{0} area {1} != {2}'.format(label, layer1['area'], layer2['area']))
+                if abs(layer1['length'] - layer2['length']) > 1e-9 * layer1['length'] + 2 * grid * layer1['vertices']:
+                    mismatches.append('{0} length {1} != {2}'.format(label, layer1['length'], layer2['length']))
+    return mismatches
+
+def compare_geoms(design1, design2):
+    '''operations whose layers differ in any coordinate'''
+    mismatches = []
+    for ii, (outputs1, outputs2) in enumerate(zip(layer_geoms(design1), layer_geoms(design2))):
+        wkb1 = [[[geom.wkb for geom in geoms] for geoms in layers] for layers in outputs1]
+        wkb2 = [[[geom.wkb for geom in geoms] for geoms in layers] for layers in outputs2]
+        if wkb1 != wkb2:
+            mismatches.append('{0}:{1}'.format(ii, design1.operations[ii]))
+    return mismatches
+
+def grid_size():
+    return popupcad.algorithms.csg_shapely.grid_size() or 0
+
+if __name__=='__main__':
+    if '--write-reference' in sys.argv:
+        reference = dict([(filename, summarize(regenerate(filename, fixed_precision=False))) for filename in test_files])
+        with open(reference_file, 'w') as f:
+            json.dump(reference, f, indent=1)
+        print('wrote ' + reference_file)
+        sys.exit()
+
+    with open(reference_file) as f:
+        reference = json.load(f)
+
+    failed = []
+    for filename in test_files:
+        floating = regenerate(filename, fixed_precision=False)
+        mismatches = compare_summaries(reference[filename], summarize(floating), 0)
+        print(filename, 'serial, floating precision, against reference:', len(mismatches), 'mismatches')
+        failed.extend(mismatches)
+
+        serial = regenerate(filename)
+        mismatches = compare_summaries(reference[filename], summarize(serial), grid_size())
+        print(filename, 'serial, fixed precision, against reference:', len(mismatches), 'mismatches')
+        failed.extend(mismatches)
+
+        parallel = regenerate(filename, processes=4)
+        mismatches = compare_geoms(serial, parallel)
+        print(filename, 'parallel against serial:', len(mismatches), 'mismatches')
+        failed.extend(mismatches)
+
+    for mismatch in failed:
+        print(mismatch)
+    if len(failed)>0:
+        raise(Exception('regenerated outputs differ.'))